@@ -0,0 +1,59 @@
+"""Compares the allRegions extraction of get_leagues before and after utils.jsliteral on a synthetic home page
+Run from the repository root: python -m benchmarks.bench_all_regions
+"""
+
+import re
+import json
+import timeit
+
+from benchmarks import fixtures
+from crawlers import whoscored_crawler
+from utils import jsliteral
+
+REPEAT = 5
+NUMBER = 20
+
+
+def legacy(page: bytes) -> list:
+    """get_leagues as it was: whole page decoded, greedy regex, literal turned into json by four substitutions"""
+    resp = re.sub('\n', '', page.decode('utf-8'))
+    match = re.findall(r'var\sallRegions\s=\s(.*\]}\]);', resp)
+    var = re.sub('\'', '"', match[0])
+    var = re.sub('{', '{"', var)
+    var = re.sub(':', '":', var)
+    var = re.sub(', ', ', "', var)
+
+    return json.loads(var)
+
+
+def current(page: bytes) -> list:
+    """get_leagues as it is: allRegions span found on the raw bytes, then read by utils.jsliteral"""
+    match = whoscored_crawler.ALL_REGIONS_RE.search(page)
+
+    return jsliteral.loads(match.group(1).decode('utf-8'))
+
+
+def best_ms(func, page: bytes) -> float:
+    return min(timeit.repeat(lambda: func(page), repeat=REPEAT, number=NUMBER)) / NUMBER * 1000
+
+
+def main():
+    page = fixtures.homepage()
+    print('home page: %d KB, %d regions' % (len(page) // 1024, len(current(page))))
+    print('results equal: %s' % (legacy(page) == current(page)))
+    for func in (legacy, current):
+        print('%-8s %8.2f ms' % (func.__name__, best_ms(func, page)))
+
+    tricky = fixtures.homepage(tricky=True) #escaped quotes and tabs send jsliteral down its scanner
+    print('%-8s %8.2f ms with escaped names' % (current.__name__, best_ms(current, tricky)))
+    for func in (legacy, current):
+        try:
+            regions = func(tricky)
+            names = [tournament['name'] for region in regions for tournament in region['tournaments']]
+            print('%-8s tricky names: %s' % (func.__name__, 'ok' if set(fixtures.TRICKY_DECODED) <= set(names) else 'wrong'))
+        except ValueError as err:
+            print('%-8s tricky names: failed (%s)' % (func.__name__, err))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compares deriving role stats and experience player by player with utils.statspec against utils.columnar
+Run from the repository root: python -m benchmarks.bench_columnar [players]
+"""
+
+import sys
+import time
+
+from benchmarks import fixtures
+from utils import cons
+from utils import columnar
+from utils import statspec
+
+PLAYERS = 20000
+
+
+def per_player(tables: dict) -> dict:
+    """Role stats as the crawler derives them for a single player, repeated for every player and role"""
+    stats = dict()
+    for role, groups in cons.ROLE_STATS.items():
+        categories = statspec.categories(groups)
+        stats[role] = {player_id: statspec.aggregate([(key, tables[key][player_id]) for key in categories])
+                       for player_id in tables[('summary', 'all')]}
+
+    return stats
+
+
+def vectorized(columns: columnar.ColumnarStore) -> dict:
+    """Role stats of all players at once, as plain dicts"""
+    return {role: columns.player_stats(groups) for role, groups in cons.ROLE_STATS.items()}
+
+
+def per_player_experience(tables: dict) -> dict:
+    """Experience as the crawler's _get_player_xp derives it, player by player"""
+    return {player_id: statspec.experience(rows) for player_id, rows in tables[('summary', 'all')].items()}
+
+
+def timed_ms(func, *args) -> tuple:
+    start = time.perf_counter()
+    result = func(*args)
+
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else PLAYERS
+    tables = fixtures.stats_tables(players=players)
+
+    columns, load = timed_ms(columnar.ColumnarStore.from_tables, tables)
+    legacy, legacy_ms = timed_ms(per_player, tables)
+    current, current_ms = timed_ms(vectorized, columns)
+    derived = 0.0
+    for category, subcategory in cons.STATS_CATEGORIES:
+        derived += timed_ms(columns.derive, category, subcategory)[1]
+    experience = timed_ms(columns.experience)[1]
+
+    print('players: %d, rows: %d' % (players, sum(len(rows) for table in tables.values() for rows in table.values())))
+    print('results equal: %s' % (legacy == current))
+    print('experience equal: %s' % (per_player_experience(tables) == columns.experience_stats()))
+    print('%-26s %8.2f ms' % ('per player (statspec)', legacy_ms))
+    print('%-26s %8.2f ms' % ('columnar load', load))
+    print('%-26s %8.2f ms' % ('columnar, as dicts', current_ms))
+    print('%-26s %8.2f ms' % ('columnar, all categories', derived))
+    print('%-26s %8.2f ms' % ('columnar, experience', experience))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Measures get_leagues, add_data, get_basic_player_info and update_players against the local stand-in site, at several
+concurrency levels, reporting requests/s, p50/p99 latency and peak memory of every step
+Run from the repository root: python -m benchmarks.bench_crawl --concurrency 5 20 50 --latency 0.05
+"""
+
+import argparse
+import logging
+import time
+import tracemalloc
+
+from benchmarks import standin
+from crawlers import whoscored_crawler
+from utils import ratelimit
+from utils import session
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Crawl throughput against a local whoscored stand-in')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[5, 20, 50],
+                        help='requests in flight at the same time, one run per level (default: %(default)s)')
+    parser.add_argument('--leagues', type=int, default=5, help='leagues crawled by add_data (default: %(default)s)')
+    parser.add_argument('--players', type=int, default=200,
+                        help='players crawled by get_basic_player_info and update_players (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds every response is delayed')
+    parser.add_argument('--jitter', type=float, default=0.05, help='seconds of random extra delay, at most')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with a 500')
+    parser.add_argument('--blocked-rate', type=float, default=0.0, help='share of requests answered with a 429')
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help='requests per second the rate limiter starts at and is capped to (default: %(default)s)')
+    parser.add_argument('--bulk', action='store_true', help='run update_players in bulk mode as well')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='do not trace memory, tracing slows every step down')
+    return parser.parse_args()
+
+
+class Recorder(object):
+
+    def __init__(self):
+        """Latencies of every response received by the sessions it is hooked to"""
+        super().__init__()
+
+        self.latencies = list()
+
+    def hook(self, resp, *args, **kwargs):
+        self.latencies.append(resp.elapsed.total_seconds()) #list.append is atomic, sessions run in many threads
+
+    def percentile(self, q: float) -> float:
+        value = session.percentile(self.latencies, q)
+
+        return value * 1000 if value is not None else 0.0
+
+
+def crawler_for(stand: standin.StandIn, concurrency: int, args, recorder: Recorder):
+    """
+    :return: crawler talking to the stand-in only, every session reporting to recorder
+    """
+    limiter = ratelimit.AIMDRateLimiter(rate=args.rate, max_rate=args.rate, burst=args.rate)
+
+    def build(country_code: str=None):
+        ses = whoscored_crawler.WhoScoredCrawler._new_session(country_code=country_code, limiter=limiter,
+                                                              base_url=stand.url, pool_maxsize=concurrency)
+        ses.hooks['response'].append(recorder.hook)
+        return ses
+
+    pool = session.SessionPool(build=build, warm_url=stand.url)
+
+    return whoscored_crawler.WhoScoredCrawler(max_concurrency=concurrency, host_concurrency=concurrency,
+                                              rate_limiter=limiter, session_pool=pool, base_url=stand.url)
+
+
+def measure(name: str, func, stand: standin.StandIn, recorder: Recorder, memory: bool):
+    """Runs a step and prints what it cost
+    :return: what func returned
+    """
+    recorder.latencies = list()
+    requests = stand.counts['total']
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2 if memory else 0.0
+    if memory:
+        tracemalloc.stop()
+    requests = stand.counts['total'] - requests
+
+    print('  %-22s %6d req %8.2f s %8.1f req/s  p50 %7.1f ms  p99 %7.1f ms  peak %7.1f MB'
+          % (name, requests, elapsed, requests / elapsed if elapsed else 0.0,
+             recorder.percentile(50), recorder.percentile(99), peak))
+
+    return result
+
+
+def main():
+    args = parse_args()
+    logging.getLogger('phoenix').setLevel(logging.WARNING) #the crawler logs every player otherwise
+    stand = standin.StandIn(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            blocked_rate=args.blocked_rate).start()
+    print('stand-in at %s: latency %.3f s + up to %.3f s, errors %.1f%%, 429s %.1f%%'
+          % (stand.url, args.latency, args.jitter, args.error_rate * 100, args.blocked_rate * 100))
+    memory = not args.no_memory
+    try:
+        for concurrency in args.concurrency:
+            print('concurrency %d' % concurrency)
+            recorder = Recorder()
+            crawler = crawler_for(stand, concurrency=concurrency, args=args, recorder=recorder)
+            leagues = measure('get_leagues', crawler.get_leagues, stand, recorder, memory)
+            leagues = measure('add_data', lambda: crawler.add_data(leagues=leagues[:args.leagues]),
+                              stand, recorder, memory)
+            players = [player for league in leagues for team in league['teams'] for player in team['players']]
+            players = measure('get_basic_player_info',
+                              lambda: crawler.get_basic_player_info(players=players[:args.players]),
+                              stand, recorder, memory)
+            measure('update_players', lambda: crawler.update_players(players=[dict(player) for player in players]),
+                    stand, recorder, memory)
+            if args.bulk:
+                stages = crawler.get_stages(leagues=leagues)
+                measure('update_players bulk',
+                        lambda: crawler.update_players(players=[dict(player) for player in players], stages=stages),
+                        stand, recorder, memory)
+            crawler.close()
+    finally:
+        stand.stop()
+
+
+if __name__ == '__main__':
+    main()
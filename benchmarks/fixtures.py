@@ -0,0 +1,176 @@
+"""Synthetic stand-ins for whoscored.com pages, shaped like the real ones but generated, so no site data is shipped"""
+
+import random
+import zlib
+
+from utils import cons
+from utils import statspec
+
+REGION_COUNT = 230 #about as many regions as the real home page lists
+FILLER_SIZE = 400 * 1024 #bytes of markup around the inline script, the real home page is about this heavy
+SEASONS = ['2019/2020', '2018/2019', '2017/2018', '2016/2017', '2015/2016', '2014/2015', '2013/2014']
+CALENDAR_SEASONS = ['2019', '2018', '2017', '2016', '2015', '2014', '2013'] #leagues played within a calendar year
+TOURNAMENTS = ['Premier League', 'UEFA Champions League', 'Championship', 'FA Cup', 'Serie A']
+ROLES = ['Goalkeeper', 'Defender', 'Midfielder', 'Forward']
+TEAMS_PER_STAGE = 20 #teams of a league's current stage
+SQUAD_SIZE = 25 #players of a team
+TRICKY_NAMES = ['Women\\\'s Super League', 'Liga 1: Play-off', 'Cup, Group A', 'Primera División',
+                'Copa\tLiga'] #as written in the page's JavaScript, with an escaped quote and a literal tab
+TRICKY_DECODED = [name.replace('\\\'', '\'') for name in TRICKY_NAMES] #as a JavaScript engine reads them
+
+
+def _tournament(region_id: int, tournament_id: int, name: str) -> str:
+    return "{id:%d, url:'/Regions/%d/Tournaments/%d/%s', name:'%s'}" % (
+        tournament_id, region_id, tournament_id, name.replace(' ', '-').replace('\\\'', ''), name)
+
+
+def all_regions(tricky: bool=False, seed: int=0) -> str:
+    """
+    :param tricky: set this to True to put names containing quotes, ':' and ', ' in the literal
+    :param seed: seed of the generated ids and sizes
+    :return: the allRegions array literal, as written in the home page's inline script
+    """
+    rnd = random.Random(seed)
+    regions = list()
+    for region_id in range(1, REGION_COUNT + 1):
+        tournaments = list()
+        for index in range(rnd.randint(1, 10)):
+            name = 'League %d' % index
+            if tricky and index == 0:
+                name = TRICKY_NAMES[region_id % len(TRICKY_NAMES)]
+            tournaments.append(_tournament(region_id, region_id * 100 + index, name))
+        regions.append("{type:%d, id:%d, flg:'flg-%d', name:'Region %d', url:'/Regions/%d/Show/Region-%d', "
+                       "tournaments:[%s]}" % (region_id % 2, region_id, region_id, region_id, region_id, region_id,
+                                              ','.join(tournaments)))
+
+    return '[' + ',\n'.join(regions) + ']'
+
+
+def homepage(tricky: bool=False, seed: int=0) -> bytes:
+    """
+    :param tricky: see all_regions
+    :param seed: seed of the generated ids and sizes
+    :return: body of the home page, with allRegions in an inline script between heavy markup
+    """
+    block = '<div class="match-row"><span class="team">Home</span><span class="team">Away</span></div>\n'
+    filler = block * (FILLER_SIZE // len(block) // 2)
+    script = '<script type="text/javascript">\nvar allRegions = %s;\nvar favoriteTournaments = [];\n</script>\n' \
+             % all_regions(tricky=tricky, seed=seed)
+
+    return ('<!DOCTYPE html>\n<html><head></head><body>\n' + filler + script + filler + '</body></html>\n').encode('utf-8')
+
+
+def stats_tables(players: int, seed: int=0) -> dict:
+    """
+    :param players: number of players
+    :param seed: seed of the generated careers and values
+    :return: dict[(category, subcategory)][playerId] = rows, shaped like the crawler's league tables; careers skip
+             seasons, so some have cons.FIRST_IRRELEVANT_SEASON and some do not, and a third are in calendar years
+    """
+    rnd = random.Random(seed)
+    careers = dict()
+    for player_id in range(1, players + 1):
+        names = CALENDAR_SEASONS if player_id % 3 == 0 else SEASONS
+        seasons = sorted(rnd.sample(names, rnd.randint(1, len(names))), reverse=True)
+        careers[str(player_id)] = [(season, rnd.choice(TOURNAMENTS)) for season in seasons]
+
+    tables = dict()
+    for category, subcategory in [('summary', 'all')] + cons.STATS_CATEGORIES:
+        fields = statspec.fields(category, subcategory)
+        table = tables[(category, subcategory)] = dict()
+        for player_id, career in careers.items():
+            table[player_id] = [dict({field: rnd.randint(0, 90) for field in fields},
+                                     seasonName=season, tournamentName=tournament) for season, tournament in career]
+
+    return tables
+
+
+def _filler(size: int) -> str:
+    block = '<div class="match-row"><span class="team">Home</span><span class="team">Away</span></div>\n'
+
+    return block * (size // len(block))
+
+
+def league_page(region_id: int, tournament_id: int) -> bytes:
+    """
+    :return: body of a league's main page: a seasons select and the links to its teams' and players' statistics
+    """
+    options = ''.join('<option value="/Regions/%d/Tournaments/%d/Seasons/%d/League">%d/%d</option>'
+                      % (region_id, tournament_id, 7000 + year, year, year + 1) for year in range(2009, 2020))
+    stage = '/Regions/%d/Tournaments/%d/Seasons/7019/Stages/%05d' % (region_id, tournament_id, 10000 + tournament_id % 90000)
+    links = '<a id="link-statistics" href="%s/TeamStatistics/League">Team Statistics</a>' \
+            '<a id="link-player-statistics" href="%s/PlayerStatistics/League">Player Statistics</a>' % (stage, stage)
+
+    return ('<!DOCTYPE html>\n<html><head></head><body>\n' + _filler(60 * 1024) + '<select id="seasons">' + options +
+            '</select>' + links + _filler(60 * 1024) + '</body></html>\n').encode('utf-8')
+
+
+def history_page() -> bytes:
+    """
+    :return: body of a player's or team's page, with the Model-last-Mode header value in an inline script
+    """
+    script = "<script type=\"text/javascript\">\nrequire.config.params['args'] = { 'Model-last-Mode': 'c3RhbmQtaW4=' };\n</script>\n"
+
+    return ('<!DOCTYPE html>\n<html><head></head><body>\n' + _filler(40 * 1024) + script + _filler(40 * 1024) +
+            '</body></html>\n').encode('utf-8')
+
+
+def team_table(stage_id: int) -> dict:
+    """
+    :return: GetTeamStatistics response of a stage
+    """
+    teams = [{'name': 'Team %d' % team_id, 'teamId': team_id, 'teamRegionName': 'Region %d' % (stage_id % 230),
+              'rating': 6.5} for team_id in range(stage_id * 100, stage_id * 100 + TEAMS_PER_STAGE)]
+
+    return {'teamTableStats': teams, 'paging': {'currentPage': 1, 'totalPages': 1, 'totalResults': len(teams)}}
+
+
+def _squad(team_id: int) -> list:
+    return list(range(team_id * 100, team_id * 100 + SQUAD_SIZE))
+
+
+def player_rows(player_id: int, category: str, subcategory: str, current: bool=False) -> list:
+    """
+    :param current: set this to True to get the current season only
+    :return: playerTableStats of a player for a category, newest season first, always the same for the same arguments
+    """
+    rnd = random.Random(zlib.crc32(('%d/%s/%s' % (player_id, category, subcategory)).encode('utf-8')))
+    fields = set(cons.SUMMARY_FIELDS)
+    if (category, subcategory) in cons.STATS_SPEC:
+        fields.update(statspec.fields(category, subcategory))
+    seasons = SEASONS[:1] if current else SEASONS[:1 + player_id % len(SEASONS)]
+
+    rows = list()
+    for season in seasons:
+        row = {'playerId': player_id, 'name': 'Player %d' % player_id, 'teamId': player_id // 100,
+               'teamName': 'Team %d' % (player_id // 100), 'seasonName': season,
+               'tournamentName': TOURNAMENTS[rnd.randrange(len(TOURNAMENTS))], 'positionText': ROLES[player_id % 4],
+               'playedPositions': '-%s-' % ROLES[player_id % 4][:2].upper(), 'age': 18 + player_id % 17,
+               'height': 170 + player_id % 30, 'weight': 65 + player_id % 25, 'rating': 6.5}
+        row.update({field: rnd.randint(0, 90) for field in sorted(fields)})
+        rows.append(row)
+
+    return rows
+
+
+def squad_table(team_id: int) -> dict:
+    """
+    :return: GetPlayerStatistics response of a team's current squad
+    """
+    players = [player_rows(player_id, 'summary', 'all', current=True)[0] for player_id in _squad(team_id)]
+
+    return {'playerTableStats': players, 'paging': {'currentPage': 1, 'totalPages': 1, 'totalResults': len(players)}}
+
+
+def stage_table(stage_id: int, category: str, subcategory: str, page: int, per_page: int=50) -> dict:
+    """
+    :return: one page of the GetPlayerStatistics response of every player of a stage, for bulk mode; as on the site,
+             a player's row only covers the stage, his other seasons are left out
+    """
+    players = [player_id for team_id in range(stage_id * 100, stage_id * 100 + TEAMS_PER_STAGE)
+               for player_id in _squad(team_id)]
+    rows = [row for player_id in players[(page - 1) * per_page:page * per_page]
+            for row in player_rows(player_id, category, subcategory, current=True)]
+    pages = (len(players) + per_page - 1) // per_page
+
+    return {'playerTableStats': rows, 'paging': {'currentPage': page, 'totalPages': pages, 'totalResults': len(players)}}
@@ -0,0 +1,180 @@
+"""Local stand-in for whoscored.com serving the synthetic pages of benchmarks.fixtures, with injected latency, errors
+and 429s, so the crawler can be measured without hitting the live site
+Run from the repository root to browse it: python -m benchmarks.standin [port]
+"""
+
+import collections
+import json
+import random
+import re
+import sys
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib import parse
+
+from benchmarks import fixtures
+
+TOURNAMENT_RE = re.compile(r'/Regions/(\d+)/Tournaments/(\d+)')
+
+
+class _Server(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError): #the crawler drops streamed pages once it has read enough
+            super().handle_error(request, client_address)
+
+
+class StandIn(object):
+
+    def __init__(self, latency: float=0.0, jitter: float=0.0, error_rate: float=0.0, blocked_rate: float=0.0,
+                 port: int=0, seed: int=0):
+        """
+        :param latency: seconds every response is delayed
+        :param jitter: seconds of extra delay, at most, drawn uniformly for every response
+        :param error_rate: share of requests answered with a 500
+        :param blocked_rate: share of requests answered with a 429
+        :param port: port to listen on, any free one if 0
+        :param seed: seed of the injected delays and failures
+        """
+        super().__init__()
+
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.blocked_rate = blocked_rate
+        self.counts = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._homepage = fixtures.homepage()
+        self._history = fixtures.history_page()
+        self._bodies = dict() #fixtures never change, so each body is generated once and the stand-in stays fast
+        self._server = _Server(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        :return: base url of the stand-in, use it as the crawler's base_url
+        """
+        return 'http://127.0.0.1:%d/' % self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _fault(self) -> tuple:
+        """
+        :return: (seconds to wait, status code or None for a normal response)
+        """
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            draw = self._random.random()
+        if draw < self.blocked_rate:
+            return delay, 429
+        if draw < self.blocked_rate + self.error_rate:
+            return delay, 500
+
+        return delay, None
+
+    def _count(self, endpoint: str, status: int):
+        with self._lock:
+            self.counts[endpoint] += 1
+            self.counts['status:%d' % status] += 1
+            self.counts['total'] += 1
+
+    def route(self, path: str, query: dict) -> tuple:
+        """
+        :return: (endpoint name, content type, body) of a request
+        """
+        key = (path, tuple(sorted(query.items())))
+        with self._lock:
+            routed = self._bodies.get(key)
+        if routed is None:
+            routed = self._route(path=path, query=query)
+            with self._lock:
+                self._bodies[key] = routed
+
+        return routed
+
+    def _route(self, path: str, query: dict) -> tuple:
+        if path.endswith('GetTeamStatistics'):
+            body = fixtures.team_table(stage_id=int(query['stageId']))
+            return 'teams', 'application/json', json.dumps(body).encode('utf-8')
+        if path.endswith('GetPlayerStatistics'):
+            if query.get('playerId'):
+                rows = fixtures.player_rows(int(query['playerId']), query['category'], query['subcategory'],
+                                            current=query.get('isCurrent') == 'true')
+                body = {'playerTableStats': rows, 'paging': {'currentPage': 1, 'totalPages': 1, 'totalResults': 1}}
+                return 'player:%s' % query['category'], 'application/json', json.dumps(body).encode('utf-8')
+            if query.get('teamIds'):
+                body = fixtures.squad_table(team_id=int(query['teamIds']))
+                return 'squad', 'application/json', json.dumps(body).encode('utf-8')
+            body = fixtures.stage_table(int(query['stageId']), query['category'], query['subcategory'],
+                                        page=int(query.get('page') or 1))
+            return 'stage:%s' % query['category'], 'application/json', json.dumps(body).encode('utf-8')
+        if path == '/':
+            return 'homepage', 'text/html', self._homepage
+        match = TOURNAMENT_RE.match(path)
+        if match and '/Seasons/' not in path:
+            return 'league', 'text/html', fixtures.league_page(int(match.group(1)), int(match.group(2)))
+
+        return 'page', 'text/html', self._history
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                url = parse.urlsplit(self.path)
+                query = dict(parse.parse_qsl(url.query, keep_blank_values=True))
+                delay, status = standin._fault()
+                if delay:
+                    time.sleep(delay)
+                endpoint, content_type, body = standin.route(url.path, query)
+                if status:
+                    body, content_type = b'<html><body>Error</body></html>', 'text/html'
+                standin._count(endpoint, status if status else 200)
+                self._send(status if status else 200, content_type, body)
+
+            def do_HEAD(self):
+                self._send(200, 'text/html', b'')
+
+        return Handler
+
+
+def main():
+    standin = StandIn(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8080).start()
+    print('serving whoscored stand-in at %s, ctrl+c to stop' % standin.url)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,93 +1,521 @@
 import re
-import json
+import time
+import types
+import asyncio
 import concurrent.futures as cf
 
+from functools import partial
 from urllib import parse
 
 import requests
 
-from requests_futures.sessions import FuturesSession
-from bs4 import BeautifulSoup
+from lxml import html
 
 from utils import cons
+from utils import columnar
 from utils import session
 from utils import countries
+from utils import engine
+from utils import journal
+from utils import jsliteral
+from utils import jsondecode
 from utils import log
+from utils import metrics
+from utils import pipeline
+from utils import ratelimit
+from utils import retry
+from utils import seasons
+from utils import singleflight
+from utils import statspec
+from utils import store
+from utils import tokens
 
 
 logger = log.get_logger(logging_file='crawler.log')
 
+MODEL_LAST_MODE_RE = re.compile(b"'Model-last-Mode': '(.*=)' }")
+ALL_REGIONS_RE = re.compile(rb'var\sallRegions\s=\s([^\]]*(?:\](?!}\];)[^\]]*)*\]}\]);') #up to the first ]}]; without a lazy .*?
+
+
+def _parse_league_page(content: bytes, base_url: str) -> tuple:
+    """Retrieves all seasons and all useful urls (both teams and players) of a league in a single parse of its page
+    Defined at module level so it can run in a process pool
+    :param content: body of the response to the league's url
+    :param base_url: url of the site, passed along because worker processes do not see the crawler
+    :return: (seasons, stats_urls)
+    seasons[year] = url
+    stats_urls[teams] = url for teams' stats, stats_urls[players] = url for players' stats; None if either is missing
+    """
+    if not content.strip():
+        return dict(), None
+    tree = html.fromstring(content)
+
+    seasons = dict()
+    for option in tree.xpath('//option[contains(@value, "Seasons")]'):
+        seasons[option.text] = base_url + option.get('value')[1:]
+
+    teams = tree.xpath('//a[@id="link-statistics"]/@href')
+    players = tree.xpath('//a[@id="link-player-statistics"]/@href')
+    stats_urls = None
+    if teams and players:
+        stats_urls = {'teams': base_url + str(teams[0])[1:], 'players': base_url + str(players[0])[1:]}
+
+    return seasons, stats_urls
+
+
+def _slug(name: str) -> str:
+    """
+    :param name: team, region or player name as decoded (exp: Manchester United)
+    :return: the name as written in whoscored urls (exp: Manchester-United)
+    """
+    return '-'.join(name.split())
+
+
+def _cookie_domain(host: str) -> str:
+    """
+    :param host: host of the site (exp: www.whoscored.com)
+    :return: domain the site's cookies are set for (exp: .whoscored.com)
+    """
+    return '.' + host[len('www.'):] if host.startswith('www.') else host
+
 
 class WhoScoredCrawler(object):
 
-    def __init__(self, country_code: str=None):
+    def __init__(self, country_code: str=None,
+                 max_concurrency: int=cons.MAX_CONCURRENCY,
+                 host_concurrency: int=cons.HOST_CONCURRENCY,
+                 response_store: store.ResponseStore=None,
+                 replay: bool=False,
+                 season_store: seasons.SeasonStore=None,
+                 token_manager: tokens.TokenManager=None,
+                 crawl_journal: journal.CrawlJournal=None,
+                 job_id: str=None,
+                 rate_limiter: ratelimit.AIMDRateLimiter=None,
+                 retry_policy: retry.RetryPolicy=None,
+                 session_pool: session.SessionPool=None,
+                 hedge: bool=False,
+                 base_url: str=None,
+                 metrics_registry: metrics.MetricsRegistry=None):
         """Initializes a crawler for www.whoscored.com
         :param country_code: the country_code for the proxy if one is desired
+        :param max_concurrency: maximum number of requests in flight at the same time
+        :param host_concurrency: maximum number of requests in flight at the same time for a single host
+        :param response_store: if provided, every successful response is recorded to it
+        :param replay: set this to True to serve all requests from response_store, without any network access
+        :param season_store: if provided, closed seasons are kept in it and only the current season is refreshed
+        :param token_manager: keeps the Model-last-Mode header value, pass the same one to share it between crawlers
+        :param crawl_journal: if provided, progress of job_id is recorded to it and a crawl run again with the same
+                              job_id resumes from the last completed stage of every player
+        :param job_id: name of the crawl job, required by crawl_journal
+        :param rate_limiter: paces the requests of every session of the crawler, pass the same one to share it
+                             between crawlers
+        :param retry_policy: decides how failed requests are retried, its counters show where time goes
+        :param session_pool: sessions requests are made with, pass the same one to share it between crawlers
+        :param hedge: set this to True to send a duplicate of any request slower than the p95 latency on a second
+                      session and use whichever answers first
+        :param base_url: url of the site, cons.WHOSCORED_URL if not provided (exp: a local stand-in for benchmarks)
+        :param metrics_registry: records every request, retry and stage of the crawler, pass the same one to share it
+                                 between crawlers; export it at the end of the run with self.metrics.write
         """
         super().__init__()
 
-        if country_code:
-            try:
-                countries.get_country_name(country_code)
-                self._session = self._new_session(country_code=country_code)
-                self._country_code = country_code
-            except KeyError:
-                logger.error('bad country_code: %s' % country_code)
+        self._base_url = base_url if base_url else cons.WHOSCORED_URL
+        self._team_stats_url = self._base_url + cons.TEAM_STATS_PATH
+        self._player_stats_url = self._base_url + cons.PLAYER_STATS_PATH
+        self._engine = engine.CrawlEngine(max_concurrency=max_concurrency, host_concurrency=host_concurrency)
+        self._bulk_stats = dict()
+        self._bulk_xp = dict()
+        self._store = response_store
+        self._replay = replay
+        self._seasons = season_store
+        self._tokens = token_manager if token_manager else tokens.TokenManager()
+        self._journal = crawl_journal
+        self._job_id = job_id
+        self._limiter = rate_limiter if rate_limiter else ratelimit.AIMDRateLimiter()
+        self._retry = retry_policy if retry_policy else retry.RetryPolicy()
+        self._metrics = metrics_registry if metrics_registry else metrics.MetricsRegistry()
+        self._metrics.track(self._retry)
+        self._country_code = country_code
+        self._hedger = cf.ThreadPoolExecutor(max_workers=2 * max_concurrency) if hedge else None
+        self._flight = singleflight.SingleFlight()
+        if crawl_journal and not job_id:
+            logger.error('crawl journal needs a job_id')
+            raise SystemExit
+
+        if replay:
+            if not response_store:
+                logger.error('replay mode needs a response store')
                 raise SystemExit
+            self._sessions = None
         else:
-            self._session = self._new_session()
+            if country_code:
+                try:
+                    countries.get_country_name(country_code)
+                except KeyError:
+                    logger.error('bad country_code: %s' % country_code)
+                    raise SystemExit
+            self._sessions = session_pool if session_pool else \
+                session.SessionPool(build=partial(self._new_session, limiter=self._limiter, base_url=self._base_url,
+                                                  pool_maxsize=host_concurrency),
+                                    warm_url=self._base_url)
+            self._sessions.warm(country_code=country_code)
 
         logger.info('successfully initialized WhoScored crawler object')
 
+    @property
+    def metrics(self) -> metrics.MetricsRegistry:
+        return self._metrics
+
+    def close(self):
+        """Shuts down the hedging threads and closes the sessions and the sqlite stores of the crawler
+        A session pool or store passed to the crawler is closed too, call it once no other crawler shares them
+        """
+        if self._hedger:
+            self._hedger.shutdown(wait=True)
+        if self._sessions:
+            self._sessions.close()
+        for sqlite_store in (self._store, self._seasons, self._journal):
+            if sqlite_store:
+                sqlite_store.close()
+
     @staticmethod
-    def _new_session(country_code: str=None) -> requests.Session:
+    def _new_session(country_code: str=None, limiter: ratelimit.AIMDRateLimiter=None,
+                     base_url: str=None, pool_maxsize: int=cons.HOST_CONCURRENCY) -> requests.Session:
         """
-        :return: a new requests.Session() object configured to work with https://www.soccerstats.com/
+        :param country_code: country of the session's proxy, no proxy and no country cookie if not provided
+        :param limiter: rate limiter shared by the crawler's sessions
+        :param base_url: url of the site, cons.WHOSCORED_URL if not provided
+        :param pool_maxsize: connections kept alive, the crawler's host_concurrency so none is thrown away
+        :return: a new requests.Session() object configured to work with base_url
         """
+        host = parse.urlsplit(base_url if base_url else cons.WHOSCORED_URL).netloc
         headers = {
             cons.USER_AGENT_TAG: cons.USER_AGENT_CRAWL,
             'Pragma': 'no-cache',
-            'Host': 'www.whoscored.com',
+            'Host': host,
             'TE': 'Trailers',
             'Cache-Control': 'no-cache'
         }
         if country_code:
-            ses = session.SessionFactory().build(headers=headers, proxy=True, country_code=country_code)
+            ses = session.SessionFactory().build(headers=headers, proxy=True, country_code=country_code,
+                                                 pool_maxsize=pool_maxsize, limiter=limiter)
         else:
-            ses = session.SessionFactory().build(headers=headers)
-        ses.cookies.set(name='ct',
-                        value=country_code.upper(),
-                        domain='.whoscored.com')
+            ses = session.SessionFactory().build(headers=headers, pool_maxsize=pool_maxsize, limiter=limiter)
+        if country_code:
+            ses.cookies.set(name='ct',
+                            value=country_code.upper(),
+                            domain=_cookie_domain(host))
 
         logger.info('successfully created new session')
 
         return ses
 
-    def _crawl(self, urls: list) -> list:
-        """Crawls faster using requests_futures lib
-        :param urls: urls to be crawled
-        :return: sorted response objects
+    def _on_retry(self, err: Exception, kind: str, endpoint: str):
+        """Runs before every retry of self._retry
+        Sessions are not rebuilt here, the session pool retires the ones that fail too often
+        :param err: the error that caused the failure, raised again in replay mode where retrying cannot help
+        :param kind: retry.NETWORK, retry.PARSE or retry.BLOCKED
+        :param endpoint: what was requested, see self._endpoint
+        """
+        logger.error('retrying %s after %s error: %s' % (endpoint, kind, err))
+        self._metrics.retried(kind=kind, endpoint=endpoint)
+        if self._replay:
+            raise err
+
+    def _run(self, coro):
+        """Runs a crawl on the crawl engine, every public crawl method goes through here
+        Identical stats requests share one response only within a run, so a later crawl gets fresh stats
+        :param coro: coroutine doing the crawl
+        :return: whatever the coroutine returns
+        """
+        try:
+            return self._engine.run(coro)
+        finally:
+            self._flight.clear()
+
+    async def _awith_retry(self, func, endpoint: str=None, **kwargs):
+        """Awaits func(**kwargs) under the crawler's retry policy
+        :param endpoint: what func requests, retries are recorded under it in the metrics (see self._endpoint); if not
+                         provided, it is the one of the url and params in kwargs
+        :return: what func returned
         """
-        futures = list()
-        unsorted_result = list()
-        sorted_result = list()
-        for i in range(0, len(urls)): #initialize list
-            sorted_result.append(i)
-        ses = FuturesSession(session=self._session, max_workers=cons.WORKERS)
+        if endpoint is None:
+            endpoint = self._endpoint(url=kwargs['url'], params=kwargs.get('params'))
+
+        return await self._retry.acall(func, kwargs=kwargs, key=self._country_code,
+                                       on_error=partial(self._on_retry, endpoint=endpoint))
+
+    def _get(self, url: str, params: dict=None, **kwargs):
+        """GETs an url, every request of the crawler goes through here
+        In replay mode the response is read from the response store, otherwise successful responses are recorded to it
+        :param url: url to be requested
+        :param params: query parameters
+        :return: requests.Response or store.StoredResponse
+        """
+        if self._replay:
+            resp = self._store.get(url=url, params=params)
+            if resp is None:
+                raise store.MissingResponse(self._store.url(url=url, params=params))
+            return resp
+
+        kwargs.setdefault('timeout', self._sessions.timeout(country_code=self._country_code))
+        if self._hedger:
+            resp = self._hedged_request(url=url, params=params, **kwargs)
+        else:
+            resp = self._request(url=url, params=params, **kwargs)
+        if self._store and resp.status_code == 200:
+            self._store.put(url=url, params=params, status_code=resp.status_code, content=resp.content)
+
+        return resp
+
+    def _request(self, url: str, params: dict=None, exclude: session.PooledSession=None, started=None, **kwargs):
+        """GETs an url with a session leased from the session pool, recording its outcome and latency
+        :param url: url to be requested
+        :param params: query parameters
+        :param exclude: session not to be used, see session.SessionPool.lease
+        :param started: if provided, a callable that gets the leased session before the request is sent
+        :return: requests.Response
+        """
+        pooled = self._sessions.lease(country_code=self._country_code, exclude=exclude)
+        if started:
+            started(pooled)
+        start = time.monotonic()
+        try:
+            resp = pooled.session.get(url=url, params=params, **kwargs)
+        except Exception as err:
+            self._sessions.release(pooled, ok=False, scrub=self._clear_bad_cookies)
+            self._observe(url=url, params=params, pooled=pooled, status=type(err).__name__)
+            raise
+        latency = time.monotonic() - start
+        self._sessions.release(pooled, ok=resp.status_code < 400, latency=latency, scrub=self._clear_bad_cookies)
+        self._observe(url=url, params=params, pooled=pooled, status=resp.status_code, nbytes=len(resp.content),
+                      latency=latency)
 
-        for i in range(0, len(urls)):
-            futures.append(ses.get(url=urls[i]))
-            urls[i] = urls[i].encode('utf-8')
-        for future in cf.as_completed(futures):
-            result = future.result()
-            unsorted_result.append(result)
+        return resp
 
-        for resp in unsorted_result:
-            url = parse.unquote_to_bytes(resp.request.url)
-            index = urls.index(url)
-            sorted_result[index] = resp
+    @staticmethod
+    def _endpoint(url: str, params: dict=None) -> str:
+        """
+        :param url: url requested
+        :param params: query parameters
+        :return: name the request is grouped by in the metrics, the first two named segments of the url's path and,
+                 for StatisticsFeed requests, who the stats are of and their category (exp: Players/History or
+                 StatisticsFeed/GetPlayerStatistics:player:passes)
+        """
+        named = [part for part in parse.urlsplit(url).path.split('/') if part and not part.isdigit()][:2]
+        endpoint = '/'.join(named) if named else '/'
+        if params and params.get('category'):
+            scope = 'player' if params.get('playerId') else 'team' if params.get('teamIds') else 'stage'
+            endpoint = '%s:%s:%s' % (endpoint, scope, params['category'])
+
+        return endpoint
+
+    def _observe(self, url: str, params: dict, pooled: session.PooledSession, status, nbytes: int=0,
+                 latency: float=None):
+        """Records a request in the crawler's metrics, see metrics.MetricsRegistry.observe"""
+        self._metrics.observe(endpoint=self._endpoint(url=url, params=params), status=status, nbytes=nbytes,
+                              latency=latency, session=pooled.id, proxy=pooled.country_code)
+
+    def _hedged_request(self, url: str, params: dict=None, **kwargs):
+        """self._request, duplicated on a second session when the first one is slower than the hedge delay
+        The slower of the two keeps running in the background so its latency is still recorded
+        :param url: url to be requested
+        :param params: query parameters
+        :return: requests.Response of whichever request succeeded first
+        """
+        delay = self._sessions.hedge_delay(country_code=self._country_code)
+        if delay is None: #not enough latencies to tell a slow request yet
+            return self._request(url=url, params=params, **kwargs)
+        leased = list()
+        first = self._hedger.submit(self._request, url=url, params=params, started=leased.append, **kwargs)
+        try:
+            return first.result(timeout=delay)
+        except cf.TimeoutError:
+            pass
+
+        logger.info('hedging request to %s after %.2f seconds' % (url, delay))
+        second = self._hedger.submit(self._request, url=url, params=params,
+                                     exclude=leased[0] if leased else None, **kwargs)
+        error = None
+        for future in cf.as_completed([first, second]):
+            try:
+                return future.result()
+            except Exception as err:
+                error = err
+        raise error
+
+    async def _aget(self, url: str, **kwargs) -> requests.Response:
+        """GETs an url through the crawl engine, so that many requests can be in flight at the same time
+        :param url: url to be requested
+        :return: requests.Response
+        """
+        return await self._engine.call(url, self._get, url=url, **kwargs)
+
+    def _model_last_mode(self, url: str) -> str:
+        """Returns the Model-last-Mode header value, shared by all requests for as long as it is valid
+        :param url: page the value is read from when there is no valid one
+        :return: header value
+        """
+        if self._replay: #stored requests are not keyed by headers
+            return ''
+
+        return self._tokens.get(loader=lambda: self._get_match(url=url, pattern=MODEL_LAST_MODE_RE))
+
+    def _get_match(self, url: str, pattern, **kwargs) -> str:
+        """GETs an url, but reads the body only until pattern matches and then drops the connection
+        The body read up to the match is recorded to the response store, which is all replay needs to find it again;
+        no request of the crawler reads these pages in full, so a stored prefix is never served where a whole page is
+        :param url: url to be requested
+        :param pattern: compiled bytes regex, the value wanted is its first group
+        :return: first group of the match
+        """
+        if self._replay:
+            match = pattern.search(self._get(url=url, **kwargs).content)
+        else:
+            match = None
+            body = bytearray()
+            kwargs.setdefault('timeout', self._sessions.timeout(country_code=self._country_code))
+            pooled = self._sessions.lease(country_code=self._country_code)
+            ok = False
+            status = None
+            start = time.monotonic()
+            try:
+                resp = pooled.session.get(url=url, stream=True, **kwargs)
+                status = resp.status_code
+                if resp.status_code in ratelimit.BLOCKED_STATUS_CODES:
+                    resp.close()
+                    raise retry.BlockedError(url=url, status_code=resp.status_code)
+                if resp.status_code >= 500:
+                    resp.close()
+                    raise retry.ServerError(url=url, status_code=resp.status_code)
+                try:
+                    for chunk in resp.iter_content(chunk_size=cons.STREAM_CHUNK_SIZE):
+                        body.extend(chunk)
+                        match = pattern.search(body)
+                        if match:
+                            break
+                finally:
+                    resp.close()
+                ok = True
+            except Exception as err:
+                status = status if status else type(err).__name__
+                raise
+            finally:
+                latency = time.monotonic() - start if ok else None
+                self._sessions.release(pooled, ok=ok, latency=latency, scrub=self._clear_bad_cookies)
+                self._observe(url=url, params=None, pooled=pooled, status=status, nbytes=len(body), latency=latency)
+            if self._store and match and status == 200:
+                self._store.put(url=url, params=None, status_code=status, content=bytes(body))
+        if not match:
+            raise ValueError('%s not found on %s' % (pattern.pattern, url))
+
+        return match.group(1).decode('utf-8')
+
+    @staticmethod
+    def _is_stats(resp) -> bool:
+        """
+        :return: True if resp looks like a StatisticsFeed response, False if the site rejected the request (exp: an
+                 expired Model-last-Mode header value gets an html page)
+        """
+        return resp.status_code == 200 and resp.content.lstrip()[:1] == b'{'
+
+    @staticmethod
+    def _stats_key(url: str, params: dict) -> tuple:
+        """
+        :return: key under which identical StatisticsFeed requests are coalesced, whatever page they are made from
+        """
+        return url, tuple(sorted((name, str(value)) for name, value in params.items()))
+
+    def _fetch_stats(self, url: str, params: dict, referer: str, fields: tuple=None, **kwargs) -> dict:
+        """GETs a StatisticsFeed url, the Model-last-Mode header value is renewed once if it gets rejected
+        The site rejects an expired header value with an html page served as a 200; any other status is not about the
+        header value, so it neither renews it nor sends the request again here
+        The body is decoded here, so a response that is not a stats table raises before it can be memoized
+        :param url: url of GetTeamStatistics or GetPlayerStatistics
+        :param params: query parameters
+        :param referer: page the request is made from
+        :param fields: fields of the rows the caller reads, all of them if None
+        :return: decoded body, only its rows, projected to fields, and its paging
+        :raise retry.BlockedError: if the site refuses the request
+        :raise retry.ServerError: if the site fails to serve the request, retried as a network error
+        :raise ValueError or KeyError: if the body is not a stats table, retried as a parse error
+        """
+        for attempt in range(2):
+            model_last_mode = self._model_last_mode(url=referer)
+            headers = {
+                'X-Requested-With': 'XMLHttpRequest',
+                'Model-last-Mode': model_last_mode,
+                'Referer': referer
+            }
+            resp = self._get(url=url, params=params, headers=headers, **kwargs)
+            if resp.status_code in ratelimit.BLOCKED_STATUS_CODES:
+                raise retry.BlockedError(url=url, status_code=resp.status_code)
+            if resp.status_code >= 500: #an html error page, not a body that failed to parse
+                raise retry.ServerError(url=url, status_code=resp.status_code)
+            if resp.status_code != 200 or self._is_stats(resp):
+                break
+            logger.error('Model-last-Mode header value rejected')
+            self._tokens.invalidate(token=model_last_mode)
+        body = jsondecode.loads(resp.content)
+        table = 'teamTableStats' if url == self._team_stats_url else 'playerTableStats'
+        if table not in body:
+            raise KeyError('%s missing from %s' % (table, url))
+
+        return {table: jsondecode.project(body[table], fields=fields), 'paging': body.get('paging')}
+
+    async def _aget_stats(self, url: str, params: dict, referer: str, fields: tuple=None, **kwargs):
+        """self._fetch_stats through the crawl engine; player stats requests identical to one in flight or made earlier
+        in the run are served with the same decoded body, and requests waiting for an identical one do not take an
+        engine slot; only bodies that decoded are memoized, so a retry after a parse error requests the url again
+        The body may be shared with other calls, it must not be changed
+        :param url: url of GetTeamStatistics or GetPlayerStatistics
+        :param params: query parameters
+        :param referer: page the request is made from
+        :param fields: fields of the rows the caller reads, the memo keeps only those
+        :return: decoded body, see self._fetch_stats
+        :raise retry.BlockedError: if the site keeps refusing the request
+        """
+        fetch = partial(self._engine.call, url, self._fetch_stats, url=url, params=params, referer=referer,
+                        fields=fields, **kwargs)
+        if url != self._player_stats_url:
+            return await fetch()
+
+        return await self._flight.acall((self._stats_key(url=url, params=params), fields), fetch)
 
-        return sorted_result
+    def _crawl_iter(self, urls: list, ordered: bool=False, window: int=cons.REORDER_WINDOW):
+        """Crawls urls on cons.WORKERS threads, yielding responses as soon as they are available
+        Every page goes through self._get, so it is recorded to the response store and can be replayed
+        At most window urls are in flight or waiting to be yielded, so memory stays bounded however many urls there are
+        :param urls: urls to be crawled
+        :param ordered: set this to True to get responses in the same order as urls
+        :param window: maximum number of responses in flight plus, in ordered mode, waiting for an earlier one
+        :return: generator of (index of the url in urls, response object)
+        """
+        executor = cf.ThreadPoolExecutor(max_workers=cons.WORKERS)
+        pending = dict() #future -> index of its url
+        done = dict() #index -> response waiting for an earlier one, in ordered mode
+        submitted, wanted = 0, 0 #next url to be submitted, next index to be yielded in ordered mode
+
+        try:
+            while wanted < len(urls):
+                while submitted < len(urls) and len(pending) + len(done) < window:
+                    pending[executor.submit(self._get, url=urls[submitted])] = submitted
+                    submitted += 1
+                finished, _ = cf.wait(pending, return_when=cf.FIRST_COMPLETED)
+                for future in finished:
+                    index = pending.pop(future)
+                    if ordered:
+                        done[index] = future.result()
+                    else:
+                        wanted += 1
+                        yield index, future.result()
+                while ordered and wanted in done:
+                    yield wanted, done.pop(wanted)
+                    wanted += 1
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
 
     def get_leagues(self) -> list:
         """Creates a list with all leagues on whoscored.com
@@ -100,25 +528,19 @@ class WhoScoredCrawler(object):
         :return: all leagues or empty list if connection failed
         """
         try:
-            resp = self._session.get(url=cons.WHOSCORED_URL)
+            var = self._get_match(url=self._base_url, pattern=ALL_REGIONS_RE)
         except ConnectionError:
-            logger.error('problems connecting to %s\n...ABORTING...' % cons.WHOSCORED_URL)
+            logger.error('problems connecting to %s\n...ABORTING...' % self._base_url)
             return []
 
-        resp = re.sub('\n', '', resp.content.decode('utf-8'))
-        match = re.findall('var\sallRegions\s=\s(.*\]}\]);', resp)
-        var = re.sub('\'', '"', match[0])
-        var = re.sub('{', '{"', var)
-        var = re.sub(':', '":', var)
-        var = re.sub(', ', ', "', var)
-        regions = json.loads(var)
+        regions = jsliteral.loads(var)
 
         leagues = list()
         for region in regions:
             for tournament in region['tournaments']:
                 league = dict()
                 league['id'] = tournament['id']
-                league['url'] = cons.WHOSCORED_URL + tournament['url'][1:]
+                league['url'] = self._base_url + tournament['url'][1:]
                 league['name'] = tournament['name'] if tournament['name'] else 'Name not provided. plly coupe'
                 league['region'] = region['name']
                 league['flag'] = region['flg']
@@ -141,37 +563,60 @@ class WhoScoredCrawler(object):
 
     def add_data(self, leagues: list) -> list:
         """Crawls all seasons and teams in current season
+        Teams of all leagues and squads of all teams are discovered concurrently, within the limits of the crawl engine
+        (max_concurrency and host_concurrency of the crawler)
         :param leagues: dicts
-        :return: data collected for leagues as dicts
+        :return: data collected for leagues as dicts, in the same order as leagues
         """
-        leagues_mp = self._crawl_leagues(leagues=leagues)
-        for index in range(len(leagues)):
-            leagues[index]['seasons'] = self._get_seasons(league_mpg=leagues_mp[index])
-            leagues[index]['stats_urls'] = self._get_stats_urls(league_mpg=leagues_mp[index])
-
-        detailed_leagues = list()
-        for index in range(len(leagues)):
-            if not leagues[index]['stats_urls']:
-                continue
-            nl = leagues[index]
-            nl['teams'] = self._get_teams(league=leagues[index])
+        if len(leagues) >= cons.PARSE_PROCESS_MIN_LEAGUES:
+            with cf.ProcessPoolExecutor(max_workers=cons.PARSE_PROCESSES) as executor:
+                futures = {executor.submit(_parse_league_page, league_mpg.content, self._base_url): index
+                           for index, league_mpg in self._crawl_leagues(leagues=leagues)}
+                for future in cf.as_completed(futures):
+                    leagues[futures[future]]['seasons'], leagues[futures[future]]['stats_urls'] = future.result()
+        else:
+            for index, league_mpg in self._crawl_leagues(leagues=leagues): #pages are parsed while others download
+                leagues[index]['seasons'], leagues[index]['stats_urls'] = \
+                    _parse_league_page(content=league_mpg.content, base_url=self._base_url)
 
-            for team in nl['teams']:
-                team['players'] = self._get_players(team=team)
-            detailed_leagues.append(nl)
+        detailed_leagues = [league for league in leagues if league['stats_urls']]
+        self._run(self._add_leagues_teams(leagues=detailed_leagues))
 
         return detailed_leagues
 
-    def _crawl_leagues(self, leagues: list) -> list:
+    async def _add_leagues_teams(self, leagues: list):
+        """Runs self._add_teams for all leagues at the same time
+        :param leagues: leagues with stats urls
+        """
+        await asyncio.gather(*(self._add_teams(league=league) for league in leagues))
+
+    async def _add_teams(self, league: dict) -> dict:
+        """Adds the teams of a league, each with its squad; squads of all teams are requested at the same time
+        :param league: league with stats urls
+        :return: league with teams
+        """
+        league['teams'] = await self._awith_retry(self._get_teams, league=league,
+                                                  endpoint=self._endpoint(self._team_stats_url,
+                                                                          params={'category': 'summaryteam'}))
+        squads = await asyncio.gather(*(self._awith_retry(self._get_players, team=team,
+                                                          endpoint=self._endpoint(self._player_stats_url,
+                                                                                  params={'category': 'summary',
+                                                                                          'teamIds': team['id']}))
+                                        for team in league['teams']))
+        for team, players in zip(league['teams'], squads):
+            team['players'] = players
+        return league
+
+    def _crawl_leagues(self, leagues: list):
         """Crawls all leagues' main pages
         :param leagues: dicts
-        :return: list of Response objects
+        :return: generator of (index of the league in leagues, Response object), in the order pages arrive
         """
         leagues_urls = list()
         for league in leagues:
             leagues_urls.append(league['url'])
         try:
-            leagues_mp = self._crawl(urls=leagues_urls)
+            yield from self._crawl_iter(urls=leagues_urls)
         except Exception as err:
             logger.error('failed to retrieve all leagues\' main pages')
             logger.error(err)
@@ -179,54 +624,14 @@ class WhoScoredCrawler(object):
 
         logger.info('successfully retrieved all leagues\' main pages')
 
-        return leagues_mp
-
-    @staticmethod
-    def _get_seasons(league_mpg: requests.Response) -> dict:
-        """ Retrieves all seasons for a league
-        :param league_mpg: the response of the request to this league's url
-        :return: dict
-        dict[year] = url
-        """
-        soup = BeautifulSoup(league_mpg.content, 'lxml')
-        all_options = soup.find_all('option')
-
-        seasons = dict()
-        for option in all_options:
-            if 'Seasons' not in option.attrs['value']:
-                continue
-            seasons[option.contents[0]] = cons.WHOSCORED_URL + option.attrs['value'][1:]
-
-        return seasons
-
-    @staticmethod
-    def _get_stats_urls(league_mpg: requests.Response) -> dict:
-        """ Retrieves all useful urls for league (both teams and players)
-        :param league_mpg: the response of the request to this league's url
-        :return: dict
-        dict[teams] = url for teams' stats
-        dict[players] = dict for players' stats
-        """
-        urls = dict()
-        soup = BeautifulSoup(league_mpg.content, 'lxml')
-        try:
-            urls['teams'] = cons.WHOSCORED_URL + soup.find('a', {'id': 'link-statistics'}).attrs['href'][1:]
-            urls['players'] = cons.WHOSCORED_URL + soup.find('a', {'id': 'link-player-statistics'}).attrs['href'][1:]
-        except:
-            urls = None
-
-        return urls
-
-    def _get_teams(self, league: dict) -> list:
+    async def _get_teams(self, league: dict) -> list:
         """ Gets all teams that are playing in this league
         :param league: league to be checked
         :return: all teams as dicts
         """
         all_teams = list()
 
-        resp = self._session.get(url=league['stats_urls']['teams'])
-        stageId = re.findall('([0-9]{5})', league['stats_urls']['teams'])[0]
-        model_last_mode= self._get_header_value(resp)
+        stageId = re.findall('Stages/([0-9]+)', league['stats_urls']['teams'])[0]
 
         params = {
             'category': 'summaryteam',
@@ -245,39 +650,29 @@ class WhoScoredCrawler(object):
             'isCurrent': 'true',
             'formation': ''
         }
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': model_last_mode,
-            'Referer': league['stats_urls']['teams']
-        }
-        resp = self._session.get(url=cons.TEAM_STATS_URL, params=params, headers=headers)
-        resp = re.sub(' ', '', resp.content.decode('utf-8'))
-        resp = resp.split(',"paging')[0] #eliminate stats columns and paging vars
-        resp = resp.split('Stats":')[1]
-        resp = json.loads(resp)
+        resp = await self._aget_stats(url=self._team_stats_url, params=params, referer=league['stats_urls']['teams'],
+                                      fields=('name', 'teamId', 'teamRegionName'))
 
-        for item in resp:
+        for item in resp['teamTableStats']:
             team = dict()
             team['name'] = item['name']
             team['id'] = item['teamId']
             team['leagueId'] = league['id']
-            team['url'] = 'https://www.whoscored.com/Teams/{}/Show/{}-{}'.format(team['id'], item['teamRegionName'], team['name'])
+            team['url'] = '{}Teams/{}/Show/{}-{}'.format(self._base_url, team['id'],
+                                                         _slug(item['teamRegionName']), _slug(team['name']))
             all_teams.append(team)
 
         logger.info('succesfully retrieved all teams\' ids and urls for league %s' % league['name'])
 
         return all_teams
 
-    def _get_players(self, team: dict) -> list:
+    async def _get_players(self, team: dict) -> list:
         """ Gets all players currently in this team
         :param team: team to be checked
         :return: all players as dicts
         """
         all_players = list()
 
-        resp = self._session.get(url=team['url'])
-        model_last_mode = self._get_header_value(resp)
-
         params = {
             'category': 'summary',
             'subcategory': 'all',
@@ -304,103 +699,130 @@ class WhoScoredCrawler(object):
             'includeZeroValues': 'true',
             'numberOfPlayersToPick': ''
         }
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': model_last_mode,
-            'Referer': team['url']
-        }
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = re.sub(' ', '', resp.content.decode('utf-8'))
-        resp = resp.split(',"paging')[0]  # eliminate stats columns and paging vars
-        resp = resp.split('Stats":')[1]
-        resp = json.loads(resp)
+        resp = await self._aget_stats(url=self._player_stats_url, params=params, referer=team['url'],
+                                      fields=('name', 'playerId'))
 
-        for item in resp:
+        for item in resp['playerTableStats']:
             player = dict()
             player['name'] = item['name']
             player['id'] = item['playerId']
-            player['url'] = 'https://www.whoscored.com/Players/{}/Show/{}'.format(player['id'], player['name'])
+            player['url'] = '{}Players/{}/Show/{}'.format(self._base_url, player['id'], _slug(player['name']))
             all_players.append(player)
 
         logger.info('successfully retrieved all players\' ids and urls for team %s' % team['name'])
-        self._clear_bad_cookies()
 
         return all_players
 
-    @staticmethod
-    def _get_header_value(page: requests.Response) -> str:
-        """Returns the Model-last-Mode (fucked up name for a header)
-        :return: header value
-        """
-        return re.findall('\'Model-last-Mode\': \'(.*=)\' }', page.text)[0]
-
-    def _clear_bad_cookies(self):
-        """Clear bad cookies that crash the crawler
+    def _clear_bad_cookies(self, ses: requests.Session):
+        """Clear bad cookies that crash the crawler, run by the session pool on a session no request is using
+        :param ses: session given back to the pool
         :return: None
         """
-        val = self._session.cookies['ct']
-        self._session.cookies.clear()
-        self._session.cookies.set(name='ct',
-                        value=val,
-                        domain='.whoscored.com')
+        val = ses.cookies.get('ct')
+        ses.cookies.clear()
+        if val:
+            ses.cookies.set(name='ct',
+                            value=val,
+                            domain=_cookie_domain(parse.urlsplit(self._base_url).netloc))
 
         return
 
     def get_basic_player_info(self, players: list) -> list:
         """Given a list of players and their urls, gather basic info about them, such as age, position, history, etc.
+        All players are crawled concurrently, within the limits of the crawl engine, so pass the players of many teams
+        in a single call rather than one call per team
+        With a crawl journal, players that fail go to its dead letters and are left out of the result
         :param players: list
-        :return: list
+        :return: list, in the same order as players
         """
-        detailed_players = list()
-        for player in players:
-            try:
-                dp = self._get_player_data(player=player)
-            except:
-                self._session = self._new_session(country_code=self._country_code)
-                dp = self._get_player_data(player=player)
-            detailed_players.append(dp)
+        return self._run(self._get_basic_player_info(players=players))
+
+    async def _get_basic_player_info(self, players: list) -> list:
+        """Runs the info stage for all players at the same time
+        :param players: players with name and url
+        :return: updated players
+        """
+        players = await asyncio.gather(*(self._run_stage(stage='info', func=self._get_player_data, player=player)
+                                         for player in players))
+        return [player for player in players if player is not None]
+
+    @staticmethod
+    def _player_id(url: str) -> str:
+        """
+        :param url: player's page
+        :return: whoscored id of the player
+        """
+        return re.findall('Players/([0-9]+)', url)[0]
+
+    def _journal_lookup(self, stage: str, player: dict) -> dict:
+        """Restores what a stage added to the player if the crawl journal has the stage done already
+        :param stage: name of the stage (exp: stats)
+        :param player: player to be checked
+        :return: updated player or None if the stage still has to run
+        """
+        if not self._journal:
+            return None
+        data = self._journal.get(self._job_id, self._player_id(player['url']), stage)
+        if data is None:
+            return None
+        player.update(data)
+
+        return player
+
+    def _journal_record(self, stage: str, player: dict, before: set, err: Exception=None):
+        """Records the outcome of a stage to the crawl journal
+        :param stage: name of the stage (exp: stats)
+        :param player: player the stage ran for
+        :param before: keys the player had before the stage ran
+        :param err: the error if the stage failed, the player goes to the dead letters
+        """
+        if not self._journal:
+            return
+        player_id = self._player_id(player['url'])
+        if err:
+            logger.error('stage %s failed for player %s: %s' % (stage, player['name'], err))
+            self._journal.failed(self._job_id, player_id, stage, error=repr(err))
+        else:
+            self._journal.done(self._job_id, player_id, stage, data={key: player[key] for key in player if key not in before})
+
+    async def _run_stage(self, stage: str, func, player: dict) -> dict:
+        """Runs a stage for a player, unless the crawl journal has it done already
+        :param stage: name of the stage (exp: stats)
+        :param func: coroutine function that runs the stage for a player
+        :param player: player to be updated
+        :return: updated player or None if the stage failed and the player went to the dead letters
+        """
+        if self._journal_lookup(stage=stage, player=player):
+            return player
+        before = set(player)
+        start = time.monotonic()
+        try:
+            await func(player=player)
+        except Exception as err:
+            self._metrics.stage(stage=stage, seconds=time.monotonic() - start)
+            if not self._journal:
+                raise
+            self._journal_record(stage=stage, player=player, before=before, err=err)
+            return None
+        self._metrics.stage(stage=stage, seconds=time.monotonic() - start)
+        self._journal_record(stage=stage, player=player, before=before)
 
-        return detailed_players
+        return player
 
-    def _get_player_data(self, player: dict) -> dict:
+    async def _get_player_data(self, player: dict) -> dict:
         """Given a player with name and url, gather basic info about him
         :param player: dict
         :return: dict
         """
-        try:
-            resp = self._session.get(url=player['url'], timeout=10)
-        except:
-            self._session = self._new_session(country_code=self._country_code)
-            return self._get_player_data(player=player)
-        model_last_mode = self._get_header_value(page=resp)
-
-        params = cons.PLAYER_PARAMS
-        params['category'] = 'summary'
-        params['subcategory'] = 'all'
-        params['statsAccumulationType'] = '0'
-        params['isCurrent'] = 'true'
-        params['playerId'] = player['id']
-        params['sortBy'] = 'Rating'
-        params['field'] = 'Overall'
-        params['isMinApp'] = 'false'
-        params['ageComparisonType'] = ''
-        params['appearancesComparisonType'] = ''
-        params['positionOptions'] = ''
-        params['timeOfTheGameStart'] = ''
-        params['timeOfTheGameEnd'] = ''
-        params['page'] = ''
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': model_last_mode,
-            'Referer': player['url']
-        }
-        try:
-            resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers, timeout=10)
-        except:
-            self._session = self._new_session(country_code=self._country_code)
-            return self._get_player_data(player=player)
-        resp = json.loads(resp.content.decode('utf-8'))
-        items = resp['playerTableStats'][0]
+        params = self._stats_params(player['id'], 'summary', 'all',
+                                    isCurrent='true', sortBy='Rating', **cons.SUMMARY_PARAMS)
+
+        async def get_items() -> dict:
+            resp = await self._aget_stats(url=self._player_stats_url, params=params, referer=player['url'],
+                                          fields=('positionText', 'age', 'height', 'weight', 'playedPositions'))
+            return resp['playerTableStats'][0]
+
+        items = await self._awith_retry(get_items, endpoint=self._endpoint(self._player_stats_url, params=params))
 
         player['role'] = items['positionText']
         player['age'] = items['age']
@@ -409,463 +831,296 @@ class WhoScoredCrawler(object):
         player['played_positions'] = items['playedPositions']
 
         logger.info('successfully retrieved info about %s' % player['name'])
-        self._clear_bad_cookies()
 
         return player
 
-    def update_players(self, players: list) -> list:
+    def update_players(self, players: list, stages: list=None) -> list:
         """Call self._player_stats_by_role for all players provided
+        All players are crawled concurrently, within the limits of the crawl engine
         :param players: as stored in the database (player[n][role] = role)
-        :return: updated players
+        :param stages: league stages as returned by crawler.get_stages(); if provided, stats are fetched once per
+                       stage for all players (bulk mode) and only players missing from the league tables are
+                       crawled one by one. League tables only cover the stages provided, so those players get their
+                       stats summed over these stages only, while the others get them over their whole career;
+                       player['stats_scope'] tells which: 'stages' or 'career'
+        :return: updated players; with a crawl journal, players that failed go to its dead letters and are left out
         """
-        for player in players:
-            self._add_header_value(player=player)
+        return self._run(self._update_players(players=players, stages=stages))
 
-        for player in players:
-            self._player_stats_by_role(player=player)
+    async def _update_players(self, players: list, stages: list=None) -> list:
+        """Runs self._update_player for all players at the same time
+        :param players: as stored in the database (player[n][role] = role)
+        :param stages: league stages for bulk mode
+        :return: updated players
+        """
+        if stages:
+            await self._load_league_tables(stages=stages)
+        try:
+            players = await asyncio.gather(*(self._update_player(player=player) for player in players))
+        finally:
+            self._drop_league_tables()
 
-        for player in players:
-            self._get_player_xp(player=player)
+        return [player for player in players if player is not None]
 
-        return players
+    def stream_players(self, players: list, sink, batch_size: int=cons.DB_BATCH_SIZE, stages: list=None) -> int:
+        """Same as update_players, but every player flows on its own through header -> stats -> xp -> sink
+        Stages are connected by bounded queues, so memory stays flat and finished players are handed over early
+        :param players: as stored in the database (player[n][role] = role)
+        :param sink: blocking callable that stores a list of updated players (exp: SoccerDatabase.add_players_data)
+        :param batch_size: number of players handed to sink at a time
+        :param stages: league stages for bulk mode, see update_players
+        :return: number of players stored
+        """
+        return self._run(self._stream_players(players=players, sink=sink, batch_size=batch_size, stages=stages))
 
-    def _add_header_value(self, player: dict) -> dict:
-        """Adds the model last mode header value to player dict for use in further requests
-        :param player: as stored in the database
-        :return: updated player with header value necessary for retrieving all other stats
+    async def _stream_players(self, players: list, sink, batch_size: int, stages: list=None) -> int:
+        """Runs the streaming pipeline of self.stream_players
+        :return: number of players stored
         """
-        history_url = re.sub('Show', 'History', player['url'])
+        async def write(batch: list):
+            await self._engine.offload(sink, batch)
+            for player in batch:
+                self._journal_record(stage='sink', player=player, before=set(player))
+            logger.info('%d players handed over to sink' % len(batch))
+
+        players = [player for player in players if self._journal_lookup(stage='sink', player=player) is None]
+
+        pipe = pipeline.Pipeline(stages=[(partial(self._run_stage, 'header', self._add_header_value), cons.PIPELINE_WORKERS),
+                                         (partial(self._run_stage, 'stats', self._player_stats_by_role), cons.PIPELINE_WORKERS),
+                                         (partial(self._run_stage, 'xp', self._get_player_xp), cons.PIPELINE_WORKERS)])
+        if stages:
+            await self._load_league_tables(stages=stages)
         try:
-            resp = self._session.get(url=history_url)
-            player['model_last_mode'] = self._get_header_value(page=resp)
-        except Exception as err:
-            logger.error('when retrieving header values encountered error %s' % err)
-            self._session = self._new_session(country_code=self._country_code)
-            return self._add_header_value(player=player)
+            return await pipe.run(items=players, sink=write, batch_size=batch_size)
+        finally:
+            self._drop_league_tables()
 
-        logger.info('player %s model-last-mode header value retrieved' % player['name'])
-        return player
-
-    def _player_stats_by_role(self, player: dict) -> dict:
-        """Get statistics for player by his role (Defender, Midfielder, Forward, Goalkeeper)
-        :param player: as stored in the database (player[n][role] = role)
-        :return: updated player
+    @staticmethod
+    def get_stages(leagues: list) -> list:
+        """Gets the current stage of every league, for use in bulk mode
+        stage['id'] = stageId for whoscored.com -> str
+        stage['url'] = players' statistics page of the stage
+        :param leagues: leagues as returned by crawler.add_data()
+        :return: list of stages
         """
-        try:
-            if player['role']  == 'Defender':
-                self._get_defender_stats(defender=player)
-            elif player['role']  == 'Midfielder':
-                self._get_midfielder_stats(midfielder=player)
-            elif player['role']  == 'Forward':
-                self._get_forward_stats(forward=player)
-            elif player['role']  == 'Goalkeeper':
-                self._get_goalkeeper_stats(goalkeeper=player)
-            else:
-                logger.error('player %s has no role assigned' % player['name'])
-        except Exception as err:
-            self._session = self._new_session(country_code=self._country_code)
-            logger.error(err)
-            return self._player_stats_by_role(player=player)
+        stages = list()
+        for league in leagues:
+            if not league.get('stats_urls'):
+                continue
+            stage = dict()
+            stage['id'] = re.findall('Stages/([0-9]+)', league['stats_urls']['players'])[0]
+            stage['url'] = league['stats_urls']['players']
+            stages.append(stage)
 
-        return player
+        return stages
 
-    def _get_goalkeeper_stats(self, goalkeeper: dict) -> dict:
-        """Get statistics for players that have the goalkeeper role
-        :param goalkeeper: player as stored in the database --> player['role'] == Goalkeeper
-        :return: goalkeeper with extra stats
+    async def _load_league_tables(self, stages: list):
+        """Fetches the league tables for bulk mode and derives the stats of every player in them at once
+        :param stages: as returned by crawler.get_stages()
         """
-        params = cons.PLAYER_PARAMS
-        params['category'] = 'saves'
-        params['subcategory'] = 'shotzone'
-        params['playerId'] = re.findall('(\d.*\d)', goalkeeper['url'])[0]
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': goalkeeper['model_last_mode'],
-            'Referer': re.sub('Show', 'History', goalkeeper['url'])
-        }
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
+        columns = columnar.ColumnarStore.from_tables(await self._get_league_tables(stages=stages))
+        self._bulk_stats = {role: columns.player_stats(groups) for role, groups in cons.ROLE_STATS.items()}
+        self._bulk_xp = columns.experience_stats()
 
-        saveObox, savePenaltyArea, saveSixYardBox = 0, 0, 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            saveObox += item['saveObox']
-            savePenaltyArea += item['savePenaltyArea']
-            saveSixYardBox += item['saveSixYardBox']
-        goalkeeper['savesSixYardBox'] = int(saveSixYardBox)
-        goalkeeper['savesPenaltyArea'] = int(savePenaltyArea)
-        goalkeeper['savesOutOfBox'] = int(saveObox)
-
-        params['category'] = 'clearances'
-        params['subcategory'] = 'success'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        clearances = 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            clearances += item['clearanceTotal']
-        goalkeeper['clearances'] = int(clearances)
-
-        goalkeeper = self._get_aerial_data(player=goalkeeper)
-        self._clear_bad_cookies()
-
-        logger.info('successfully retrieved goalkeeper stats for %s' % goalkeeper['name'])
-        return goalkeeper
-
-    def _get_forward_stats(self, forward: dict) -> dict:
-        """Get statistics for players that have the forward role
-        :param forward: player as stored in the database --> player['role'] == Forward
-        :return: forward with extra stats
-        """
-        forward = self._get_passing_data(player=forward)
-        self._clear_bad_cookies()
-        forward = self._get_offensive_data(player=forward)
-        self._clear_bad_cookies()
-        forward = self._get_aerial_data(player=forward)
-        self._clear_bad_cookies()
-        forward = self._get_goals_data(player=forward)
-        self._clear_bad_cookies()
-
-        logger.info('successfully retrieved forward stats for %s' % forward['name'])
-        return forward
-
-    def _get_defender_stats(self, defender: dict) -> dict:
-        """Get statistics for players that have the defender role
-        :param defender: player as stored in the database --> player['role'] == Defender
-        :return: defender with extra stats
-        """
-        defender = self._get_passing_data(player=defender)
-        self._clear_bad_cookies()
-        defender = self._get_defensive_data(player=defender)
-        self._clear_bad_cookies()
-        defender = self._get_aerial_data(player=defender)
-        self._clear_bad_cookies()
-        defender = self._get_goals_data(player=defender)
-        self._clear_bad_cookies()
-
-        logger.info('successfully retrieved defender stats for %s' % defender['name'])
-        return defender
-
-    def _get_midfielder_stats(self, midfielder: dict) -> dict:
-        """Get statistics for players that have the defender role
-        :param midfielder: player as stored in the database --> player['role'] == Midfielder
-        :return: midfielder with extra stats
-        """
-        midfielder = self._get_passing_data(player=midfielder)
-        self._clear_bad_cookies()
-        midfielder = self._get_offensive_data(player=midfielder)
-        self._clear_bad_cookies()
-        midfielder = self._get_defensive_data(player=midfielder)
-        self._clear_bad_cookies()
-        midfielder = self._get_aerial_data(player=midfielder)
-        self._clear_bad_cookies()
-        midfielder = self._get_goals_data(player=midfielder)
-        self._clear_bad_cookies()
-
-        logger.info('successfully retrieved midfielder stats for %s' % midfielder['name'])
-        return midfielder
-
-    def _get_player_xp(self, player: dict) -> dict:
-        """Get player game experience
-        :param player: player as stored in the database
-        :return: player with experience stats as total minutes played
-        !!! international experience counts as 1.2 * minutes played, second rate leagues experience counts as 0.8 * minutes played
+    def _drop_league_tables(self):
+        self._bulk_stats = dict()
+        self._bulk_xp = dict()
+
+    async def _get_league_tables(self, stages: list) -> dict:
+        """Fetches every stats category for all players of the stages
+        :param stages: as returned by crawler.get_stages()
+        :return: dict
+        dict[(category, subcategory)][playerId] = rows for that player, newest season first
         """
-        params = cons.PLAYER_PARAMS
-        params['category'] = 'summary'
-        params['subcategory'] = 'all'
-        params['statsAccumulationType'] = '0'
-        params['playerId'] = re.findall('(\d.*\d)', player['url'])[0]
-        params['field'] = 'Overall'
-        params['isMinApp'] = 'false'
-        params['ageComparisonType'] = ''
-        params['appearancesComparisonType'] = ''
-        params['positionOptions'] = ''
-        params['timeOfTheGameStart'] = ''
-        params['timeOfTheGameEnd'] = ''
-        params['page'] = ''
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': player['model_last_mode'],
-            'Referer': re.sub('Show', 'History', player['url'])
-        }
-        try:
-            resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-            resp = json.loads(resp.content.decode('utf-8'))
-
-            experience, apps = 0, 0
-            for item in resp['playerTableStats']:
-                if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                    break
-                if item['tournamentName'] in cons.INTERNATIONAL_LEAGUES:
-                    experience += 1.2 * item['minsPlayed']
-                elif item['tournamentName'] in cons.A_RATED_LEAGUES:
-                    experience += item['minsPlayed']
-                else:
-                    experience += 0.8 * item['minsPlayed']
-                apps += item['apps']
-            player['xp'] = int(experience)
-            player['apps'] = int(apps)
-        except Exception as err:
-            logger.error('when retrieving player xp encountered error %s' % err)
-            self._session = self._new_session(country_code=self._country_code)
-            return self._get_player_xp(player=player)
+        categories = [('summary', 'all', cons.SUMMARY_PARAMS)]
+        categories.extend((category, subcategory, dict()) for category, subcategory in cons.STATS_CATEGORIES)
+
+        jobs = list()
+        for stage in stages:
+            for category, subcategory, overrides in categories:
+                jobs.append(self._get_stage_table(stage, category, subcategory, **overrides))
+        all_rows = await asyncio.gather(*jobs)
+
+        tables = dict()
+        for (category, subcategory, overrides), rows in zip(categories * len(stages), all_rows):
+            table = tables.setdefault((category, subcategory), dict())
+            for item in rows:
+                table.setdefault(str(item['playerId']), list()).append(item)
+        for table in tables.values():
+            for player_id in table:
+                table[player_id].sort(key=lambda item: item['seasonName'], reverse=True)
+
+        logger.info('successfully retrieved league tables for %d stages' % len(stages))
+        return tables
+
+    async def _get_stage_table(self, stage: dict, category: str, subcategory: str, **overrides) -> list:
+        """Fetches all pages of a stats category for a stage
+        :param stage: as returned by crawler.get_stages()
+        :param category: stats category (exp: passes)
+        :param subcategory: stats subcategory (exp: length)
+        :param overrides: any other parameter that differs from cons.PLAYER_PARAMS
+        :return: rows of all players in the stage
+        """
+        async def get_page(page: int) -> dict:
+            params = self._stats_params('', category, subcategory, **dict(overrides, stageId=stage['id'], page=str(page)))
+            return await self._aget_stats(url=self._player_stats_url, params=params, referer=stage['url'],
+                                          fields=self._row_fields(category, subcategory, 'playerId'))
+
+        endpoint = self._endpoint(self._player_stats_url, params={'category': category})
+        first = await self._awith_retry(get_page, page=1, endpoint=endpoint)
+        rows = list(first['playerTableStats']) #shared with identical requests, extended in a copy
+        pages = await asyncio.gather(*(self._awith_retry(get_page, page=page, endpoint=endpoint)
+                                       for page in range(2, first['paging']['totalPages'] + 1)))
+        for resp in pages:
+            rows.extend(resp['playerTableStats'])
+
+        return rows
+
+    async def _update_player(self, player: dict) -> dict:
+        """Retrieves header value, stats by role and experience for a single player
+        :param player: as stored in the database (player[n][role] = role)
+        :return: updated player or None if it went to the crawl journal's dead letters
+        """
+        for stage, func in (('header', self._add_header_value),
+                            ('stats', self._player_stats_by_role),
+                            ('xp', self._get_player_xp)):
+            if await self._run_stage(stage=stage, func=func, player=player) is None:
+                return None
 
-        logger.info('successfully retrieved player xp for %s' % player['name'])
         return player
 
-    def _get_offensive_data(self, player: dict) -> dict:
-        """Gets shots taken player statistics
-        :param player: player as stored in the database
-        :return: player with shots accuracy stats
+    async def _add_header_value(self, player: dict) -> dict:
+        """Adds the model last mode header value to player dict for use in further requests
+        The player's History page is only downloaded if there is no valid header value shared by all players
+        :param player: as stored in the database
+        :return: updated player with header value necessary for retrieving all other stats
         """
-        params = cons.PLAYER_PARAMS
-        params['playerId'] = re.findall('(\d.*\d)', player['url'])[0]
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': player['model_last_mode'],
-            'Referer': re.sub('Show', 'History', player['url'])
-        }
-        if params['statsAccumulationType'] == '0':
-            params['statsAccumulationType'] = '2'
-
-        params['category'] = 'shots'
-        params['subcategory'] = 'accuracy'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        son, sof, sb, sp = 0, 0, 0, 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            son += item['shotOnTarget']
-            sof += item['shotOffTarget']
-            sb += item['shotBlocked']
-            sp += item['shotOnPost']
-        player['shotsOnTarget'] = int(son)
-        player['shotsOffTarget'] = int(sof)
-        player['shotsBlocked'] = int(sb)
-        player['shotsPost'] = int(sp)
-
-        params['category'] = 'dribbles'
-        params['subcategory'] = 'success'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        td, sd = 0, 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            sd += item['dribbleWon']
-            td += item['dribbleTotal']
-        if td == 0:
-            player['dribbling'] = 0.0
-        else:
-            player['dribbling'] = round(sd / td * 100, 2)
+        history_url = re.sub('Show', 'History', player['url'])
+        player['model_last_mode'] = await self._awith_retry(partial(self._engine.call, history_url,
+                                                                    self._model_last_mode, url=history_url),
+                                                            endpoint=self._endpoint(history_url))
 
+        logger.info('player %s model-last-mode header value retrieved' % player['name'])
         return player
 
-    def _get_goals_data(self, player: dict) -> dict:
-        """Gets goals scored player statistics
-        :param player: player as stored in the database
-        :return: player with goals scored stats
+    async def _player_stats_by_role(self, player: dict) -> dict:
+        """Get statistics for player by his role (Defender, Midfielder, Forward, Goalkeeper)
+        The categories requested and the stats derived from them are given by cons.ROLE_STATS and cons.STATS_SPEC
+        :param player: as stored in the database (player[n][role] = role)
+        :return: updated player
         """
-        params = cons.PLAYER_PARAMS
-        params['category'] = 'goals'
-        params['subcategory'] = 'situations'
-        params['playerId'] = re.findall('(\d.*\d)', player['url'])[0]
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': player['model_last_mode'],
-            'Referer': re.sub('Show', 'History', player['url'])
-        }
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-
-        g, spg = 0, 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            g += item['goalNormal']
-            spg += item['goalSetPiece']
-        player['goals'] = int(g)
-        player['setPieceGoals'] = int(spg)
-
+        groups = cons.ROLE_STATS.get(player['role'])
+        if groups is None:
+            logger.error('player %s has no role assigned' % player['name'])
+            return player
+        bulk = self._bulk_player(player)
+        if bulk is not None: #bulk mode, derived for all players of the league tables at once
+            player.update(bulk[0])
+            player['stats_scope'] = 'stages'
+            logger.info('successfully retrieved %s stats for %s' % (player['role'].lower(), player['name']))
+            return player
+
+        player['stats_scope'] = 'career'
+        categories = statspec.categories(groups)
+        all_stats = await asyncio.gather(*(self._get_player_stats(player, category, subcategory)
+                                           for category, subcategory in categories))
+        player.update(statspec.aggregate(zip(categories, (resp['playerTableStats'] for resp in all_stats))))
+        logger.info('successfully retrieved %s stats for %s' % (player['role'].lower(), player['name']))
         return player
 
-    def _get_passing_data(self, player: dict) -> dict:
-        """Gets player passing statistics
-        :param player: player as stored in the database
-        :return: player with passing data added
+    @staticmethod
+    def _stats_params(player_id: str, category: str, subcategory: str, **overrides) -> types.MappingProxyType:
+        """Builds the query parameters of a single GetPlayerStatistics request
+        Every request gets its own read-only copy, so concurrent requests can never alter each other's parameters
+        :param player_id: whoscored id of the player
+        :param category: stats category (exp: passes)
+        :param subcategory: stats subcategory (exp: length)
+        :param overrides: any other parameter that differs from cons.PLAYER_PARAMS
+        :return: read-only params
         """
-        params = cons.PLAYER_PARAMS
-        params['playerId'] = re.findall('(\d.*\d)', player['url'])[0]
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': player['model_last_mode'],
-            'Referer': re.sub('Show', 'History', player['url'])
-        }
-        if params['statsAccumulationType'] == '0':
-            params['statsAccumulationType'] = '2'
-
-        params['category'] = 'passes'
-        params['subcategory'] = 'length'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        alp, ilp, asp, isp = 0, 0, 0, 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            alp += item['passLongBallAccurate']
-            ilp += item['passLongBallInaccurate']
-            asp += item['shortPassAccurate']
-            isp += item['shortPassInaccurate']
-        if asp == 0:
-            player['shortPassAccuracy'] = 0.0
-        else:
-            player['shortPassAccuracy'] = round(asp / (asp + isp) * 100, 2)
-        if alp == 0:
-            player['longPassAccuracy'] = 0.0
-        else:
-            player['longPassAccuracy'] = round(alp / (alp + ilp) * 100, 2)
-
-        params['subcategory'] = 'type'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        ac, ic = 0, 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            ac += item['passCrossAccurate']
-            ic += item['passCrossInaccurate']
-        if ac == 0:
-            player['totalCrosses'] = int(ac + ic)
-            player['crossAccuracy'] = 0.0
-        else:
-            player['totalCrosses'] = int(ac + ic)
-            player['crossAccuracy'] = round(ac / player['totalCrosses'] * 100, 2)
-
-        params['category'] = 'key-passes'
-        params['subcategory'] = 'length'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        kp = 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            kp += item['keyPassesTotal']
-        player['keyPasses'] = int(kp)
-
-        params['category'] = 'assists'
-        params['subcategory'] = 'type'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        a = 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            a += item['assist']
-        player['assists'] = int(a)
+        params = dict(cons.PLAYER_PARAMS)
+        params.update(overrides)
+        params['category'] = category
+        params['subcategory'] = subcategory
+        params['playerId'] = player_id
 
-        return player
+        return types.MappingProxyType(params)
 
-    def _get_aerial_data(self, player: dict) -> dict:
-        """Gets aerial player statistics
+    def _bulk_player(self, player: dict) -> tuple:
+        """
+        :param player: as stored in the database
+        :return: (role stats, experience) of the player derived from the league tables, or None if there are none or
+                 the player is missing from a table he needs; he is then crawled on his own for both, so his stats
+                 never mix the stages of the league tables with the rest of his career
+        """
+        player_id = self._player_id(player['url'])
+        stats = self._bulk_stats.get(player['role'], dict()).get(player_id)
+        xp = self._bulk_xp.get(player_id)
+        if stats is None or xp is None:
+            return None
+
+        return stats, xp
+
+    async def _get_player_stats(self, player: dict, category: str, subcategory: str, **overrides) -> dict:
+        """Requests a stats category for a player, over his whole career
+        With a season store, closed seasons come from the store and only the seasons still open are requested; the
+        full history is requested again whenever the open seasons differ from the ones it was stored with
         :param player: player as stored in the database
-        :return: player with aerial stats
+        :param category: stats category (exp: passes)
+        :param subcategory: stats subcategory (exp: length)
+        :param overrides: any other parameter that differs from cons.PLAYER_PARAMS
+        :return: decoded json response
         """
-        params = cons.PLAYER_PARAMS
-        params['category'] = 'aerial'
-        params['subcategory'] = 'success'
-        params['playerId'] = re.findall('(\d.*\d)', player['url'])[0]
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': player['model_last_mode'],
-            'Referer': re.sub('Show', 'History', player['url'])
-        }
-        if params['statsAccumulationType'] == '0':
-            params['statsAccumulationType'] = '2'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-
-        won, lost = 0, 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            won += item['duelAerialWon']
-            lost += item['duelAerialLost']
-        if won == 0:
-            player['aerial'] = 0.0
-        else:
-            player['aerial'] = round(won / (won + lost) * 100, 2)
+        player_id = self._player_id(player['url'])
+
+        async def get_rows(**scope) -> list:
+            params = self._stats_params(player_id, category, subcategory, **dict(overrides, **scope))
+            resp = await self._awith_retry(self._aget_stats, url=self._player_stats_url, params=params,
+                                           referer=re.sub('Show', 'History', player['url']),
+                                           fields=self._row_fields(category, subcategory))
+            return resp['playerTableStats'] #shared with identical requests, not changed
+
+        cached, current, rows = None, None, None
+        if self._seasons:
+            accumulation = self._stats_params(player_id, category, subcategory, **overrides)['statsAccumulationType']
+            cached = self._seasons.get_closed(player_id, category, subcategory, accumulation)
+        if cached is not None:
+            open_seasons, closed = cached
+            current = await get_rows(isCurrent='true')
+            if set(item['seasonName'] for item in current) == open_seasons: #no season closed since it was stored
+                rows = current + closed
+        if rows is None:
+            rows = await get_rows()
+            if self._seasons:
+                #the seasons of the current rows are the ones still open; without them, only the newest one is taken
+                #for open, so a season still being played is never stored as closed
+                open_seasons = set(item['seasonName'] for item in current) if current is not None else \
+                    set(item['seasonName'] for item in rows[:1])
+                self._seasons.put_closed(player_id, category, subcategory, accumulation, rows=rows,
+                                         open_seasons=open_seasons)
+        return {'playerTableStats': rows}
 
-        return player
+    @staticmethod
+    def _row_fields(category: str, subcategory: str, *extra) -> tuple:
+        """
+        :param extra: fields needed on top of the summed ones (exp: playerId)
+        :return: fields of a stats row that are kept after decoding
+        """
+        return ('seasonName', 'tournamentName') + statspec.fields(category, subcategory) + extra
 
-    def _get_defensive_data(self, player: dict) -> dict:
-        """Gets tackling player statistics
+    async def _get_player_xp(self, player: dict) -> dict:
+        """Get player game experience
         :param player: player as stored in the database
-        :return: player with tackling stats
+        :return: player with experience stats as total minutes played
+        !!! international experience counts as 1.2 * minutes played, second rate leagues experience counts as 0.8 * minutes played
         """
-        params = cons.PLAYER_PARAMS
-        params['playerId'] = re.findall('(\d.*\d)', player['url'])[0]
-        headers = {
-            'X-Requested-With': 'XMLHttpRequest',
-            'Model-last-Mode': player['model_last_mode'],
-            'Referer': re.sub('Show', 'History', player['url'])
-        }
-        if params['statsAccumulationType'] == '0':
-            params['statsAccumulationType'] = '2'
-
-        params['category'] = 'tackles'
-        params['subcategory'] = 'success'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        st, dp = 0, 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            st += item['tackleWonTotal']
-            dp += item['challengeLost']
-        if st == 0:
-            player['tackling'] = 0.0
-        else:
-            player['tackling'] = round(st / (st + dp) * 100, 2)
-
-        params['category'] = 'interception'
-        params['subcategory'] = 'success'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        interceptions = 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            interceptions += item['interceptionAll']
-        player['interceptions'] = int(interceptions)
-
-        params['category'] = 'clearances'
-        params['subcategory'] = 'success'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        clearances = 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            clearances += item['clearanceTotal']
-        player['clearances'] = int(clearances)
-
-        params['category'] = 'blocks'
-        params['subcategory'] = 'type'
-        resp = self._session.get(url=cons.PLAYER_STATS_URL, params=params, headers=headers)
-        resp = json.loads(resp.content.decode('utf-8'))
-        sb, cb, pb = 0, 0, 0
-        for item in resp['playerTableStats']:
-            if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
-                break
-            sb += item['outfielderBlock']
-            cb += item['passCrossBlockedDefensive']
-            pb += item['outfielderBlockedPass']
-        player['shotsBlocked'] = int(sb)
-        player['crossesBlocked'] = int(cb)
-        player['passesBlocked'] = int(pb)
+        bulk = self._bulk_player(player)
+        if bulk is not None: #bulk mode
+            player.update(bulk[1])
+            logger.info('successfully retrieved player xp for %s' % player['name'])
+            return player
+        resp = await self._get_player_stats(player, 'summary', 'all', **cons.SUMMARY_PARAMS)
+        player.update(statspec.experience(resp['playerTableStats']))
 
+        logger.info('successfully retrieved player xp for %s' % player['name'])
         return player
@@ -1,21 +1,70 @@
-"""Run script with the region name you want the premier league's teams and players database built for
-exp: region = Italy will create a database named Italy.db in database directory"""
+"""Run script with the regions and leagues you want the teams and players database built for
+exp: python db_builder.py --regions Italy Spain --leagues "Serie A" "La Liga"
+     will create the databases Italy.db and Spain.db in database directory
+     python db_builder.py --database Top5
+     will create a single database Top5.db with the teams and players of every league in cons.A_RATED_LEAGUES
+All leagues are crawled at the same time by a single crawler, so one rate limiter and session pool pace every request
+Players that still fail after their retries go to the crawl journal's dead letters and are left out of the databases;
+running the script again the same day resumes the crawl"""
 
-region = 'Italy'
+regions = ['England', 'Italy', 'Spain', 'Germany', 'France'] #regions of cons.A_RATED_LEAGUES
+
+import argparse
+import datetime
 
 from crawlers import whoscored_crawler
 from database import db
+from utils import cons
+from utils import journal
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build teams and players databases from whoscored.com')
+    parser.add_argument('--regions', nargs='+', default=regions,
+                        help='regions whose leagues are crawled (default: %(default)s)')
+    parser.add_argument('--leagues', nargs='+', default=cons.A_RATED_LEAGUES,
+                        help='names of the leagues crawled in those regions (default: %(default)s)')
+    parser.add_argument('--database', default=None,
+                        help='name of a single database for all regions, one database per region if not given')
+    parser.add_argument('--metrics', default=None,
+                        help='file the crawl metrics are written to at the end of the run, '
+                             'a JSON summary if it ends with .json and Prometheus text otherwise')
+    return parser.parse_args()
 
 def main():
-    crawler = whoscored_crawler.WhoScoredCrawler(country_code='gb')
-    dbo = db.SoccerDatabase(name=region)
-    leagues = crawler.get_leagues()
-    leagues = crawler.select_leagues_by_region(leagues=leagues, region_name=region)
-    premier_league = crawler.add_data(leagues=[leagues[0]])
-    for team in premier_league[0]['teams']:
-        team['players'] = crawler.get_basic_player_info(players=team['players'])
-        dbo.add_team_and_players(team)
-    print('database %s successfully created' % region)
+    args = parse_args()
+    job_name = args.database if args.database else '-'.join(args.regions)
+    crawl_journal = journal.CrawlJournal('../database/%s-journal.db' % job_name)
+    job_id = 'build-%s-%s' % (job_name, datetime.date.today())
+    crawler = whoscored_crawler.WhoScoredCrawler(country_code='gb', crawl_journal=crawl_journal, job_id=job_id)
+    try:
+        leagues = crawler.get_leagues()
+        leagues = [league for region in args.regions
+                   for league in crawler.select_leagues_by_region(leagues=leagues, region_name=region)
+                   if league['name'] in args.leagues]
+        if not leagues:
+            print('no league named %s in %s' % (', '.join(args.leagues), ', '.join(args.regions)))
+            return
+
+        leagues = crawler.add_data(leagues=leagues)
+        players = [player for league in leagues for team in league['teams'] for player in team['players']]
+        crawled = set(id(player) for player in crawler.get_basic_player_info(players=players)) #all teams at once
+
+        databases = dict()
+        for league in leagues:
+            name = args.database if args.database else league['region']
+            if name not in databases:
+                databases[name] = db.SoccerDatabase(name=name)
+            for team in league['teams']:
+                team['players'] = [player for player in team['players'] if id(player) in crawled]
+                databases[name].add_team_and_players(team)
+        for unit in crawl_journal.dead_letters(job_id):
+            print('player %s failed at stage %s: %s' % (unit['player_id'], unit['stage'], unit['error']))
+        if args.metrics:
+            crawler.metrics.write(args.metrics)
+        for name in databases:
+            print('database %s successfully created' % name)
+    finally:
+        crawler.close()
 
 if __name__ == '__main__':
     main()
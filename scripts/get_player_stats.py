@@ -2,17 +2,25 @@
 
 db_name = 'Italy'
 
+import datetime
+
 from crawlers import whoscored_crawler
 from database import db
+from utils import journal
 from utils import util
 
 def main():
-    crawler = whoscored_crawler.WhoScoredCrawler(country_code='gb')
+    crawl_journal = journal.CrawlJournal('../database/%s-journal.db' % db_name)
+    job_id = '%s-%s' % (db_name, datetime.date.today()) #running the script again the same day resumes the crawl
+    crawler = whoscored_crawler.WhoScoredCrawler(country_code='gb', crawl_journal=crawl_journal, job_id=job_id)
     dbo = db.SoccerDatabase(name=db_name)
     players_obj = dbo.get_players()
     players_dict = util.plr_obj_to_dict(players=players_obj)
-    players = crawler.update_players(players=players_dict)
-    dbo.add_players_data(players=players)
+    crawler.stream_players(players=players_dict, sink=dbo.add_players_data)
+    for unit in crawl_journal.dead_letters(job_id):
+        print('player %s failed at stage %s: %s' % (unit['player_id'], unit['stage'], unit['error']))
+    crawler.metrics.write('../database/%s-%s-metrics.json' % (db_name, datetime.date.today()))
+    crawler.close()
     print('database %s successfully updated' % db_name)
 
 if __name__ == '__main__':
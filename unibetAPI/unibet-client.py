@@ -10,6 +10,8 @@ import traceback
 from utils import session
 from utils import fingerprint
 from utils import log
+from utils import metrics
+from utils import retry
 from utils import cons
 from utils import util
 
@@ -19,10 +21,16 @@ logger = log.get_logger()
 class BetClient(object):
     """Client for unibet"""
 
-    def __init__(self, country_code, username, password, owner, max_bet=5, skip_over=8):
+    def __init__(self, country_code, username, password, owner, max_bet=5, skip_over=8, metrics_registry=None):
+        """
+        :param metrics_registry: metrics.MetricsRegistry every request of the client is recorded to, pass the same one
+                                 to share it between clients
+        """
 
         self._username = username
         self._country_code = country_code
+        self._metrics = metrics_registry if metrics_registry else metrics.MetricsRegistry(prefix='unibet')
+        self._sessions = 0
         self._session = self._new_session()
         self._password = password
         self._owner = owner
@@ -76,6 +84,10 @@ class BetClient(object):
     def max_bet(self):
         return self._max_bet
 
+    @property
+    def metrics(self):
+        return self._metrics
+
     def _new_session(self):
         """Creates a request.Session() to be used by client for all requests
         :return: a new session configured with proxy of country = self._country_code if Proxy=True
@@ -87,9 +99,19 @@ class BetClient(object):
             'Cache-Control': 'no-cache'
         }
         ses = session.SessionFactory().build(headers=headers, country_code=self._country_code)
+        self._sessions += 1
+        self._metrics.instrument(ses, session='%s-%d' % (self._username, self._sessions))
 
         return ses
 
+    def _retried(self, endpoint, err=None):
+        """Records a retry of the client in its metrics
+        :param endpoint: what is retried (exp: /login-api/methods/password)
+        :param err: the error that caused the retry, None if a step just reported failure
+        """
+        kind = retry.classify(err) if err is not None else None
+        self._metrics.retried(kind=kind if kind else 'failed', endpoint=endpoint)
+
     def login(self, retry=False):
         """
         :param retry: if False and function fails, it will call itself with retry=True; self._new_session is called if this happens
@@ -103,6 +125,7 @@ class BetClient(object):
             logger.error('%s failed to set cookies' % self._username)
             if not retry:
                 logger.info('%s recreating session' % self._username)
+                self._retried(endpoint='login:cookies', err=err)
                 self._session = self._new_session()
                 return self.login(retry=True)
             else:
@@ -146,6 +169,7 @@ class BetClient(object):
                 self._username = resp['userName']
         except Exception as err:
             if not retry:
+                self._retried(endpoint=metrics.endpoint_of(url), err=err)
                 self._session = self._new_session()
                 return self.login(retry=True)
             else:
@@ -154,6 +178,7 @@ class BetClient(object):
 
         if not self._set_data():
             if not retry:
+                self._retried(endpoint='login:data')
                 self._session = self._new_session()
                 return self.login(retry=True)
             else:
@@ -161,6 +186,7 @@ class BetClient(object):
 
         if not self._get_kambi_session():
             if not retry:
+                self._retried(endpoint='login:kambi')
                 self._session = self._new_session()
                 return self.login(retry=True)
             else:
@@ -401,6 +427,7 @@ class BetClient(object):
             return float(balance)
         except Exception as err:
             if not retry:
+                self._retried(endpoint=metrics.endpoint_of(url), err=err)
                 return self.get_balance(retry=True)
             else:
                 logger.error('{0} failed to retrieve balance, error: {1}'.format(self._username, err))
@@ -434,6 +461,7 @@ class BetClient(object):
                 return False
         except Exception as err:
             if not retry:
+                self._retried(endpoint=metrics.endpoint_of(url), err=err)
                 return self.is_logged_in(retry=True)
             else:
                 logger.error('{0} could not check if logged in: {1}'.format(self.username, err))
@@ -640,6 +668,7 @@ class BetClient(object):
             resp = self._session.get(url=url, params=params, headers=headers)
         except Exception as err:
             if not retry:
+                self._retried(endpoint=metrics.endpoint_of(url), err=err)
                 return self._prepare_bet(odds=odds, options=options, index=index, retry=True)
             else:
                 logger.error(traceback.print_tb(err.__traceback__))
@@ -684,6 +713,7 @@ class BetClient(object):
             self._session.post(url=url, params=params, json=data, headers=headers)
         except Exception as err:
             if not retry:
+                self._retried(endpoint=metrics.endpoint_of(url), err=err)
                 return self._prepare_bet(odds=odds, options=options, index=index, retry=True)
             else:
                 logger.error(traceback.print_tb(err.__traceback__))
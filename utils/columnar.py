@@ -0,0 +1,182 @@
+import numpy as np
+
+from utils import cons
+from utils import statspec
+
+
+def _codes(values: list) -> tuple:
+    """
+    :param values: hashable values, most of them repeated (exp: tournament names)
+    :return: (distinct values in order of first appearance, code of every value as an index into them)
+    """
+    index = dict()
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int32, count=len(values))
+
+    return np.array(list(index), dtype=object), codes
+
+
+class StatsTable(object):
+
+    def __init__(self, rows: list, player: np.ndarray, fields: tuple, relevant: np.ndarray):
+        """Rows of one stats category as columns, tournament as categorical codes
+        :param rows: stats rows, those of a player newest season first
+        :param player: code of the player of every row
+        :param fields: numeric fields kept as columns
+        :param relevant: True for every row that is summed, see statspec.relevant
+        """
+        super().__init__()
+
+        self.player = player
+        self.tournaments, self.tournament = _codes([row['tournamentName'] for row in rows])
+        self.values = np.zeros(len(rows), dtype=[(field, 'f8') for field in fields])
+        for field in fields:
+            self.values[field] = [row[field] for row in rows]
+        self.relevant = relevant
+
+    def sums(self, field: str, size: int, weights: np.ndarray=None) -> np.ndarray:
+        """
+        :param field: column to be added up
+        :param size: number of players
+        :param weights: if provided, factor of every row
+        :return: sum of field over the relevant rows, per player code
+        """
+        values = self.values[field] * self.relevant
+        if weights is not None:
+            values = values * weights
+
+        return np.bincount(self.player, weights=values, minlength=size)
+
+    def present(self, size: int) -> np.ndarray:
+        """
+        :param size: number of players
+        :return: True for every player code with rows in the table
+        """
+        return np.bincount(self.player, minlength=size) > 0
+
+
+class ColumnarStore(object):
+
+    def __init__(self):
+        """Stats rows of many players as one columnar table per (category, subcategory), players share their codes
+        across tables so derived stats of every category line up
+        Only bulk mode loads it, from the league tables; a player crawled on his own is derived by statspec
+        """
+        super().__init__()
+
+        self._index = dict()
+        self._tables = dict()
+
+    @classmethod
+    def from_tables(cls, tables: dict):
+        """
+        :param tables: dict[(category, subcategory)][playerId] = rows, as the crawler's league tables
+        :return: store holding all the rows
+        """
+        columns = cls()
+        for (category, subcategory), table in tables.items():
+            columns.add(category, subcategory, table=table)
+
+        return columns
+
+    @property
+    def players(self) -> list:
+        """
+        :return: player ids, in the order of their codes
+        """
+        return list(self._index)
+
+    def add(self, category: str, subcategory: str, table: dict):
+        """
+        :param table: dict[playerId] = rows of the category, newest season first
+        """
+        rows, player, relevant = list(), list(), list()
+        for player_id, player_rows in table.items():
+            code = self._index.setdefault(player_id, len(self._index))
+            rows.extend(player_rows)
+            player.extend([code] * len(player_rows))
+            counted = statspec.relevant(player_rows) #the same rule as the per player path, row by row
+            relevant.extend([True] * counted + [False] * (len(player_rows) - counted))
+        self._tables[(category, subcategory)] = StatsTable(rows=rows, player=np.array(player, dtype=np.int32),
+                                                           fields=statspec.fields(category, subcategory),
+                                                           relevant=np.array(relevant, dtype=bool))
+
+    def present(self, category: str, subcategory: str) -> np.ndarray:
+        """
+        :return: True for every player code with rows in the category
+        """
+        if (category, subcategory) not in self._tables:
+            return np.zeros(len(self._index), dtype=bool)
+
+        return self._tables[(category, subcategory)].present(size=len(self._index))
+
+    def derive(self, category: str, subcategory: str) -> dict:
+        """Vectorized statspec.derive for every player at once
+        :return: dict[stat] = values per player code; counts as int, ratios as unrounded percentages
+        """
+        table = self._tables[(category, subcategory)]
+        size = len(self._index)
+        sums = {field: table.sums(field, size=size) for field in statspec.fields(category, subcategory)}
+
+        spec = cons.STATS_SPEC[(category, subcategory)]
+        stats = dict()
+        for stat, summed in spec.get('sums', dict()).items():
+            stats[stat] = sum(sums[field] for field in summed).astype(np.int64)
+        for stat, (numerator, denominator) in spec.get('ratios', dict()).items():
+            part = sum(sums[field] for field in numerator)
+            whole = sum(sums[field] for field in denominator)
+            valid = (part != 0) & (whole != 0)
+            stats[stat] = np.divide(part, whole, out=np.zeros(size), where=valid) * 100
+
+        return stats
+
+    def experience(self) -> dict:
+        """Vectorized statspec.experience of the summary rows
+        :return: dict with xp and apps, values per player code
+        """
+        table = self._tables[('summary', 'all')]
+        size = len(self._index)
+        weights = np.array([statspec.xp_weight(tournament) for tournament in table.tournaments])
+
+        return {'xp': table.sums('minsPlayed', size=size, weights=weights[table.tournament]).astype(np.int64),
+                'apps': table.sums('apps', size=size).astype(np.int64)}
+
+    def _by_player(self, columns: dict, present: np.ndarray) -> dict:
+        """
+        :param columns: dict[stat] = list of values per player code
+        :param present: True for the player codes to be kept
+        :return: dict[playerId] = dict[stat] = value
+        """
+        players = self.players
+
+        return {players[code]: {stat: values[code] for stat, values in columns.items()}
+                for code in np.flatnonzero(present).tolist()}
+
+    def player_stats(self, groups: tuple) -> dict:
+        """Stats of some stats groups for every player that has rows in all of their categories
+        Values are the ones statspec.aggregate gives, ratios rounded to two decimals
+        :param groups: names of cons.STATS_GROUPS (exp: cons.ROLE_STATS['Defender'])
+        :return: dict[playerId] = dict[stat] = value
+        """
+        categories = statspec.categories(groups)
+        present = np.ones(len(self._index), dtype=bool)
+        columns = dict()
+        for category, subcategory in categories:
+            present &= self.present(category, subcategory)
+            if not present.any():
+                return dict()
+            ratios = cons.STATS_SPEC[(category, subcategory)].get('ratios', dict())
+            for stat, values in self.derive(category, subcategory).items():
+                values = values.tolist()
+                columns[stat] = [round(value, 2) for value in values] if stat in ratios else values
+
+        return self._by_player(columns=columns, present=present)
+
+    def experience_stats(self) -> dict:
+        """
+        :return: dict[playerId] = dict with xp and apps, for every player with summary rows
+        """
+        if ('summary', 'all') not in self._tables:
+            return dict()
+        columns = {stat: values.tolist() for stat, values in self.experience().items()}
+
+        return self._by_player(columns=columns, present=self.present('summary', 'all'))
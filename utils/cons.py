@@ -1,3 +1,5 @@
+import types
+
 #session related constants
 USER_AGENT_TAG = 'User-Agent'
 USER_AGENT_CRAWL = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:64.0) Gecko/20100101 Firefox/64.0'
@@ -9,10 +11,48 @@ FIRST_IRRELEVANT_SEASON = '2014/2015' #crawl only current season and last three
 A_RATED_LEAGUES = ['Premier League', 'Serie A', 'La Liga', 'Bundesliga', 'Ligue 1']
 INTERNATIONAL_LEAGUES = ['UEFA Champions League', 'FIFA World Cup', 'UEFA Europa League']
 WORKERS = 10
+REORDER_WINDOW = 50 #pages in flight or waiting for an earlier one when crawling many urls at once
+PARSE_PROCESS_MIN_LEAGUES = 50 #leagues from which on their pages are parsed in a process pool
+PARSE_PROCESSES = None #processes parsing league pages, None for one per cpu
+MEMO_SIZE = 2000 #stats responses a crawler keeps for identical requests made later in the same run
+MAX_CONCURRENCY = 100 #requests in flight at the same time for the async engine
+HOST_CONCURRENCY = 20 #requests in flight at the same time for a single host
+STREAM_CHUNK_SIZE = 16 * 1024 #bytes read at a time when only part of a page is needed
+PIPELINE_WORKERS = 20 #players handled at the same time by every stage of a streaming crawl
+QUEUE_SIZE = 50 #players waiting between two stages of a streaming crawl
+DB_BATCH_SIZE = 20 #players written to the database in a single transaction
+TOKEN_TTL = 60 * 60 #seconds a Model-last-Mode header value is reused before it is retrieved again
+RATE_START = 10.0 #requests per second a host starts at
+RATE_MIN = 0.5 #requests per second a host that keeps blocking is slowed down to
+RATE_MAX = 100.0 #requests per second a host that never blocks is sped up to
+RATE_INCREASE = 1.0 #requests per second added for every second without being blocked
+RATE_DECREASE = 0.5 #factor the rate is multiplied with when a host blocks or times out
+RATE_BURST = 10.0 #requests a host gets at once after being idle
+RETRY_ATTEMPTS = 5 #calls made, the first one included, before a failing request is given up
+RETRY_BACKOFF = 0.5 #seconds waited, at most, before the first retry; doubled for every further retry
+RETRY_MAX_BACKOFF = 30.0 #seconds waited, at most, before any retry
+BREAKER_WINDOW = 20 #latest requests through a proxy country the failure rate is computed on
+BREAKER_FAILURE_RATE = 0.5 #failure rate that pauses all traffic through a proxy country
+BREAKER_COOLDOWN = 30.0 #seconds traffic through a proxy country stays paused
+DNS_TTL = 5 * 60 #seconds a proxy host name resolution is reused
+SESSION_POOL_SIZE = 4 #sessions kept ready per proxy country
+SESSION_MAX_REQUESTS = 1000 #requests a pooled session serves before it is retired
+SESSION_MIN_REQUESTS = 20 #requests a pooled session serves before its error rate is judged
+SESSION_MAX_ERROR_RATE = 0.3 #error rate that retires a pooled session
+SESSION_WARM_TIMEOUT = 10 #seconds a new pooled session waits for its warm-up request
+LATENCY_WINDOW = 100 #latest request latencies kept per pooled session
+LATENCY_MIN_SAMPLES = 20 #latencies needed before timeouts and hedging adapt to them
+DEFAULT_TIMEOUT = 10 #seconds a request waits while there are not enough latencies
+TIMEOUT_FACTOR = 3.0 #adaptive timeout as a multiple of the p95 latency
+TIMEOUT_MIN = 2.0 #seconds, lowest adaptive timeout
+TIMEOUT_MAX = 30.0 #seconds, highest adaptive timeout
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0) #seconds, upper bounds of the metrics' latency histograms
 WHOSCORED_URL = 'https://www.whoscored.com/'
-TEAM_STATS_URL = 'https://www.whoscored.com/StatisticsFeed/1/GetTeamStatistics'
-PLAYER_STATS_URL = 'https://www.whoscored.com/StatisticsFeed/1/GetPlayerStatistics'
-PLAYER_PARAMS = {
+TEAM_STATS_PATH = 'StatisticsFeed/1/GetTeamStatistics' #relative to the site's url, so a stand-in site can serve it
+PLAYER_STATS_PATH = 'StatisticsFeed/1/GetPlayerStatistics'
+TEAM_STATS_URL = WHOSCORED_URL + TEAM_STATS_PATH
+PLAYER_STATS_URL = WHOSCORED_URL + PLAYER_STATS_PATH
+PLAYER_PARAMS = types.MappingProxyType({ #read-only, use WhoScoredCrawler._stats_params for a request's own copy
             'category': '',
             'subcategory': '',
             'statsAccumulationType': '2',
@@ -37,4 +77,62 @@ PLAYER_PARAMS = {
             'page': '1',
             'includeZeroValues': 'true',
             'numberOfPlayersToPick': ''
+})
+SUMMARY_FIELDS = ('minsPlayed', 'apps') #fields of summary rows that experience is computed from
+STATS_SPEC = { #(category, subcategory): stats derived from the sums of its rows over the relevant seasons
+            #'sums': {stat: fields added up}, 'ratios': {stat: (numerator fields, denominator fields)} as a percentage
+            ('saves', 'shotzone'): {'sums': {'savesSixYardBox': ('saveSixYardBox',),
+                                             'savesPenaltyArea': ('savePenaltyArea',),
+                                             'savesOutOfBox': ('saveObox',)}},
+            ('clearances', 'success'): {'sums': {'clearances': ('clearanceTotal',)}},
+            ('aerial', 'success'): {'ratios': {'aerial': (('duelAerialWon',), ('duelAerialWon', 'duelAerialLost'))}},
+            ('shots', 'accuracy'): {'sums': {'shotsOnTarget': ('shotOnTarget',),
+                                             'shotsOffTarget': ('shotOffTarget',),
+                                             'shotsBlocked': ('shotBlocked',),
+                                             'shotsPost': ('shotOnPost',)}},
+            ('dribbles', 'success'): {'ratios': {'dribbling': (('dribbleWon',), ('dribbleTotal',))}},
+            ('goals', 'situations'): {'sums': {'goals': ('goalNormal',),
+                                               'setPieceGoals': ('goalSetPiece',)}},
+            ('passes', 'length'): {'ratios': {'shortPassAccuracy': (('shortPassAccurate',),
+                                                                    ('shortPassAccurate', 'shortPassInaccurate')),
+                                              'longPassAccuracy': (('passLongBallAccurate',),
+                                                                   ('passLongBallAccurate', 'passLongBallInaccurate'))}},
+            ('passes', 'type'): {'sums': {'totalCrosses': ('passCrossAccurate', 'passCrossInaccurate')},
+                                 'ratios': {'crossAccuracy': (('passCrossAccurate',),
+                                                              ('passCrossAccurate', 'passCrossInaccurate'))}},
+            ('key-passes', 'length'): {'sums': {'keyPasses': ('keyPassesTotal',)}},
+            ('assists', 'type'): {'sums': {'assists': ('assist',)}},
+            ('tackles', 'success'): {'ratios': {'tackling': (('tackleWonTotal',), ('tackleWonTotal', 'challengeLost'))}},
+            ('interception', 'success'): {'sums': {'interceptions': ('interceptionAll',)}},
+            ('blocks', 'type'): {'sums': {'shotsBlocked': ('outfielderBlock',),
+                                          'crossesBlocked': ('passCrossBlockedDefensive',),
+                                          'passesBlocked': ('outfielderBlockedPass',)}}
+}
+STATS_CATEGORIES = list(STATS_SPEC) #(category, subcategory)
+STATS_GROUPS = { #stats that belong together, as (category, subcategory)
+            'saves': [('saves', 'shotzone')],
+            'clearances': [('clearances', 'success')],
+            'aerial': [('aerial', 'success')],
+            'goals': [('goals', 'situations')],
+            'offensive': [('shots', 'accuracy'), ('dribbles', 'success')],
+            'passing': [('passes', 'length'), ('passes', 'type'), ('key-passes', 'length'), ('assists', 'type')],
+            'defensive': [('tackles', 'success'), ('interception', 'success'), ('clearances', 'success'),
+                          ('blocks', 'type')]
+}
+ROLE_STATS = { #stats groups of every role, later groups override earlier ones (defensive shotsBlocked over offensive)
+            'Goalkeeper': ('saves', 'clearances', 'aerial'),
+            'Forward': ('passing', 'offensive', 'aerial', 'goals'),
+            'Defender': ('passing', 'defensive', 'aerial', 'goals'),
+            'Midfielder': ('passing', 'offensive', 'defensive', 'aerial', 'goals')
 }
+SUMMARY_PARAMS = types.MappingProxyType({ #PLAYER_PARAMS overrides for the summary category
+            'statsAccumulationType': '0',
+            'field': 'Overall',
+            'isMinApp': 'false',
+            'ageComparisonType': '',
+            'appearancesComparisonType': '',
+            'positionOptions': '',
+            'timeOfTheGameStart': '',
+            'timeOfTheGameEnd': '',
+            'page': ''
+})
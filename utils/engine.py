@@ -0,0 +1,82 @@
+import asyncio
+import concurrent.futures as cf
+
+from functools import partial
+from urllib import parse
+
+from utils import cons
+
+
+class CrawlEngine(object):
+
+    def __init__(self, max_concurrency: int=cons.MAX_CONCURRENCY, host_concurrency: int=cons.HOST_CONCURRENCY):
+        """Asyncio based engine that runs blocking requests calls concurrently
+        :param max_concurrency: maximum number of requests in flight at the same time
+        :param host_concurrency: maximum number of requests in flight at the same time for a single host
+        """
+        super().__init__()
+
+        self._max_concurrency = max_concurrency
+        self._host_concurrency = host_concurrency
+        self._loop = None
+        self._executor = None
+        self._writer = None
+        self._global_limit = None
+        self._host_limits = dict()
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    @property
+    def host_concurrency(self) -> int:
+        return self._host_concurrency
+
+    def run(self, coro):
+        """Runs a coroutine to completion on a fresh event loop
+        :param coro: coroutine that uses self.call for its blocking work
+        :return: whatever the coroutine returns
+        """
+        self._executor = cf.ThreadPoolExecutor(max_workers=self._max_concurrency)
+        self._writer = cf.ThreadPoolExecutor(max_workers=1)
+        self._global_limit = None
+        self._host_limits = dict()
+        try:
+            return asyncio.run(self._main(coro))
+        finally:
+            self._executor.shutdown(wait=True)
+            self._writer.shutdown(wait=True)
+            self._executor = None
+            self._writer = None
+            self._loop = None
+
+    async def _main(self, coro):
+        self._loop = asyncio.get_running_loop()
+        self._global_limit = asyncio.Semaphore(self._max_concurrency)
+
+        return await coro
+
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self._host_concurrency)
+
+        return self._host_limits[host]
+
+    async def call(self, url: str, func, /, *args, **kwargs):
+        """Runs a blocking function in the engine's thread pool, counted against url's host limit
+        :param url: url the function is going to request
+        :param func: blocking callable
+        :return: func(*args, **kwargs)
+        """
+        host = parse.urlsplit(url).netloc
+        async with self._global_limit:
+            async with self._host_limit(host):
+                return await self._loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def offload(self, func, /, *args, **kwargs):
+        """Runs blocking work that is not a request (exp: database writes) on a single dedicated thread
+        Calls run one after another, in the order they were made, so func does not need to be thread safe
+        :param func: blocking callable
+        :return: func(*args, **kwargs)
+        """
+        return await self._loop.run_in_executor(self._writer, partial(func, *args, **kwargs))
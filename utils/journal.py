@@ -0,0 +1,69 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class CrawlJournal(object):
+
+    def __init__(self, path: str):
+        """Progress of crawl jobs, one row per (job, player, stage), so interrupted crawls can be resumed
+        :param path: sqlite file the journal is kept in, created if missing
+        """
+        super().__init__()
+
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS units ('
+                           'job_id TEXT, '
+                           'player_id TEXT, '
+                           'stage TEXT, '
+                           'status TEXT, '
+                           'data TEXT, '
+                           'error TEXT, '
+                           'updated_at REAL, '
+                           'PRIMARY KEY (job_id, player_id, stage))')
+        self._conn.commit()
+
+    def get(self, job_id: str, player_id: str, stage: str) -> dict:
+        """
+        :return: data the stage produced for the player, or None if the stage is not done
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT data FROM units WHERE job_id = ? AND player_id = ? AND stage = ? '
+                                     'AND status = ?', (job_id, player_id, stage, 'done')).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def done(self, job_id: str, player_id: str, stage: str, data: dict):
+        """Marks a stage as done for a player
+        :param data: whatever the stage added to the player, restored on resume instead of crawling it again
+        """
+        self._set(job_id, player_id, stage, status='done', data=json.dumps(data), error=None)
+
+    def failed(self, job_id: str, player_id: str, stage: str, error: str):
+        """Puts a player in the dead letters of the job
+        :param error: description of what went wrong
+        """
+        self._set(job_id, player_id, stage, status='failed', data=None, error=error)
+
+    def _set(self, job_id: str, player_id: str, stage: str, status: str, data: str, error: str):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               (job_id, player_id, stage, status, data, error, time.time()))
+            self._conn.commit()
+
+    def dead_letters(self, job_id: str) -> list:
+        """
+        :return: failed units of the job as dicts with player_id, stage and error
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT player_id, stage, error FROM units WHERE job_id = ? AND status = ? '
+                                      'ORDER BY updated_at', (job_id, 'failed')).fetchall()
+
+        return [{'player_id': row[0], 'stage': row[1], 'error': row[2]} for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
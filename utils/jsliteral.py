@@ -0,0 +1,159 @@
+import re
+import json
+
+
+#a bare key right before its colon, in code that has no strings left in it
+_KEY_RE = re.compile(r'([A-Za-z_$][\w$]*)(?=:)')
+_TOKEN_RE = re.compile(r'''
+    (?:\s+|//[^\n]*|/\*.*?\*/)*                 #whitespace and comments
+    (?:([{}\[\],:])                             #punctuation
+      |'((?:[^'\\\n]|\\.)*)'                    #single quoted string
+      |"((?:[^"\\\n]|\\.)*)"                    #double quoted string
+      |(-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?) #number
+      |([A-Za-z_$][\w$]*)                       #name: a bare key, true, false, null or undefined
+      |\Z)''', re.DOTALL | re.VERBOSE)
+_ESCAPE_RE = re.compile(r'\\(u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|\n|.)', re.DOTALL)
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0', '\n': ''}
+_CONSTANTS = {'true': True, 'false': False, 'null': None, 'undefined': None}
+_STRING, _NUMBER, _NAME, _END = 'string', 'number', 'name', 'end'
+#(JavaScript, placeholder while strings are split off, json): an escaped backslash first, so \\' ends a string
+_PLACEHOLDERS = (('\\\\', '\1', '\\\\'), ("\\'", '\2', "'"), ('"', '\3', '\\"'))
+
+
+class JSLiteralError(ValueError):
+    """The text is not a JavaScript literal this module can read"""
+
+
+def _unescape(match) -> str:
+    escape = match.group(1)
+    if escape[0] in 'ux' and len(escape) > 1:
+        return chr(int(escape[1:], 16))
+
+    return _ESCAPES.get(escape, escape)
+
+
+def _tokens(text: str) -> list:
+    """
+    :param text: the literal
+    :return: (kind, value) of every token, then (_END, None); kind is the punctuation itself, _STRING with the string
+             unescaped, _NUMBER or _NAME with the text of the token
+    """
+    tokens, pos = list(), 0
+    while True:
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            raise JSLiteralError('not a literal: %r at %d' % (text[pos:pos + 20], pos))
+        pos = match.end()
+        kind = match.lastindex
+        if kind is None:
+            tokens.append((_END, None))
+            return tokens
+        value = match.group(kind)
+        if kind == 1:
+            tokens.append((value, None))
+        elif kind in (2, 3):
+            tokens.append((_STRING, _ESCAPE_RE.sub(_unescape, value) if '\\' in value else value))
+        else:
+            tokens.append((_NUMBER if kind == 4 else _NAME, value))
+
+
+def _value(tokens: list, index: int) -> tuple:
+    """Builds the value starting at a token, recursing into objects and arrays
+    :return: (value, index of the token after it)
+    """
+    kind, value = tokens[index]
+    if kind == '{':
+        obj, index = dict(), index + 1
+        while tokens[index][0] != '}':
+            kind, key = tokens[index]
+            if kind not in (_STRING, _NUMBER, _NAME) or tokens[index + 1][0] != ':':
+                raise JSLiteralError('not a literal: bad key %r' % (key if key is not None else kind))
+            obj[key], index = _value(tokens, index + 2)
+            if tokens[index][0] == ',':
+                index += 1
+            elif tokens[index][0] != '}':
+                raise JSLiteralError('not a literal: %r after a value' % tokens[index][0])
+        return obj, index + 1
+    if kind == '[':
+        array, index = list(), index + 1
+        while tokens[index][0] != ']':
+            item, index = _value(tokens, index)
+            array.append(item)
+            if tokens[index][0] == ',':
+                index += 1
+            elif tokens[index][0] != ']':
+                raise JSLiteralError('not a literal: %r after a value' % tokens[index][0])
+        return array, index + 1
+    if kind == _STRING:
+        return value, index + 1
+    if kind == _NUMBER:
+        return float(value) if '.' in value or 'e' in value or 'E' in value else int(value), index + 1
+    if kind == _NAME and value in _CONSTANTS:
+        return _CONSTANTS[value], index + 1
+
+    raise JSLiteralError('not a literal: unexpected %r' % (value if value is not None else kind))
+
+
+def _scan(text: str):
+    """Reads any literal in a single pass over its tokens, building the structures as it goes"""
+    tokens = _tokens(text)
+    value, index = _value(tokens, 0)
+    if tokens[index][0] != _END:
+        raise JSLiteralError('not a literal: %r after the end' % tokens[index][0])
+
+    return value
+
+
+def _not_a_literal(constant: str):
+    raise JSLiteralError('not a literal: %s' % constant)
+
+
+def _plain(text: str):
+    """Reads a literal laid out like allRegions: single quoted strings, bare keys right before their colons, no
+    comments; only str methods and one regex split run over the text, the structures are built by the json module's
+    C decoder. Escaped backslashes and quotes and double quotes are swapped for placeholders while the strings are
+    told apart from the code, every other escape reads the same in json
+    :return: the value, or None if the literal is not laid out that way
+    """
+    if '\0' in text:
+        return None
+    swapped = list()
+    for escape, placeholder, escaped in _PLACEHOLDERS:
+        if escape in text:
+            if placeholder in text:
+                return None
+            text = text.replace(escape, placeholder)
+            swapped.append((placeholder, escaped))
+    pieces = text.split("'") #code, string, code, ..., code
+    code = '\0'.join(pieces[0::2])
+    if len(pieces) % 2 == 0 or '/' in code or '\3' in code or text.count('\n') != code.count('\n'):
+        return None #unbalanced quotes, comments, double quoted strings or line breaks in strings
+    #every key is wrapped in double quotes, strings get them in place of their single quotes
+    pieces[0::2] = '"'.join(_KEY_RE.split(code)).split('\0')
+    text = '"'.join(pieces)
+    for placeholder, escaped in swapped:
+        text = text.replace(placeholder, escaped)
+    try:
+        #strict=False lets tabs and other control characters through, as JavaScript strings do
+        return json.loads(text, strict=False, parse_constant=_not_a_literal) #NaN and Infinity are json only
+    except ValueError: #anything else json does not read (exp: a trailing comma, undefined or a \x41 escape)
+        return None
+
+
+def loads(text: str):
+    """Reads a JavaScript object literal (exp: var allRegions = [{type:1, name:'Europe', ...}]) into python objects
+    Literals laid out like allRegions, escaped quotes in names included, take a fast path about as fast as the four
+    blind substitutions get_leagues used before (see benchmarks/bench_all_regions.py), which broke on any name with
+    a quote, a colon or a comma in it
+    Any other literal is read by a scanner that also takes double quoted strings, every JavaScript escape, quoted
+    and numeric keys, trailing commas, comments and undefined; it is about ten times slower, which only matters if
+    the site changes the layout
+    Expressions, function calls and regexes are not literals and are rejected
+    :param text: the literal, without the assignment around it
+    :return: dicts, lists, str, int, float, bool or None
+    """
+    value = _plain(text)
+    if value is not None:
+        return value
+
+    return _scan(text)
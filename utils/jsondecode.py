@@ -0,0 +1,30 @@
+import json
+
+try:
+    import orjson
+except ImportError: #optional, about twice as fast; the json module reads the same bytes
+    orjson = None
+
+
+def loads(content: bytes):
+    """Decodes a JSON body straight from the response bytes, without decoding it to str first
+    :param content: response body
+    :return: decoded body
+    """
+    if orjson:
+        return orjson.loads(content)
+
+    return json.loads(content)
+
+
+def project(rows: list, fields: tuple=None) -> list:
+    """
+    :param rows: stats rows as decoded
+    :param fields: fields to be kept, all of them if None
+    :return: rows with only fields, so whatever is kept in memory stays small
+             (the whole body is decoded first, projecting does not make decoding any cheaper)
+    """
+    if not fields:
+        return rows
+
+    return [{field: row[field] for field in fields} for row in rows]
@@ -0,0 +1,286 @@
+import bisect
+import collections
+import json
+import re
+import threading
+import time
+
+from urllib import parse
+
+import requests
+
+from requests.adapters import BaseAdapter
+
+from utils import cons
+
+
+_ID_RE = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_of(url: str) -> str:
+    """
+    :param url: url requested
+    :return: its path with numeric ids collapsed and path parameters dropped (exp: /Players/:id/History/Name for
+             /Players/123/History/Name, /coupon/validate.json for /coupon/validate.json;jsessionid=...), so requests
+             group by endpoint
+    """
+    return _ID_RE.sub('/:id', parse.urlsplit(url).path.split(';')[0])
+
+
+class Histogram(object):
+
+    def __init__(self, buckets: tuple=cons.LATENCY_BUCKETS):
+        """Counts of observations per bucket, cumulative on export like Prometheus histograms
+        :param buckets: upper bounds, ascending
+        """
+        super().__init__()
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) #the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: quantile wanted, between 0 and 1
+        :return: upper bound of the bucket the quantile falls in, None if nothing was observed
+                 (the highest bucket if it falls in +Inf)
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+        return self.buckets[-1]
+
+
+class MetricsRegistry(object):
+
+    def __init__(self, prefix: str='crawler', buckets: tuple=cons.LATENCY_BUCKETS):
+        """Telemetry of a run: every HTTP call by endpoint, status, bytes, latency, session and proxy, retries and stage
+        durations; exported at the end of the run as Prometheus text or as a JSON summary
+        A single registry can be shared by many crawlers and clients, it is thread-safe
+        :param prefix: prefix of the exported metric names
+        :param buckets: upper bounds, in seconds, of the latency histograms
+        """
+        super().__init__()
+
+        self._prefix = prefix
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._requests = collections.Counter() #(endpoint, status) -> requests
+        self._bytes = collections.Counter() #endpoint -> bytes received
+        self._latency = dict() #endpoint -> Histogram
+        self._sessions = collections.Counter() #(session, status) -> requests
+        self._proxies = collections.Counter() #(proxy, status) -> requests
+        self._retries = collections.Counter() #(endpoint, kind) -> retries
+        self._stages = dict() #stage -> Histogram
+        self._policies = list()
+
+    def _histogram(self, histograms: dict, key: str) -> Histogram:
+        if key not in histograms:
+            histograms[key] = Histogram(buckets=self._buckets)
+
+        return histograms[key]
+
+    def observe(self, endpoint: str, status, nbytes: int=0, latency: float=None, session=None, proxy: str=None):
+        """Records an HTTP call
+        :param endpoint: what was called (exp: player:passes or /Players/:id/History/Name)
+        :param status: status code, or the name of the error if there was no response
+        :param nbytes: bytes of the body received
+        :param latency: seconds the call took, if it completed
+        :param session: id of the session that made the call
+        :param proxy: proxy country the call went through
+        """
+        status = str(status)
+        with self._lock:
+            self._requests[(endpoint, status)] += 1
+            self._bytes[endpoint] += nbytes
+            if latency is not None:
+                self._histogram(self._latency, endpoint).observe(latency)
+            if session is not None:
+                self._sessions[(str(session), status)] += 1
+            self._proxies[(proxy if proxy else 'direct', status)] += 1
+
+    def retried(self, kind: str, endpoint: str='unknown'):
+        """Records a retry
+        :param kind: retry.NETWORK, retry.PARSE or retry.BLOCKED
+        :param endpoint: what was retried, if known
+        """
+        with self._lock:
+            self._retries[(endpoint, kind)] += 1
+
+    def stage(self, stage: str, seconds: float):
+        """Records how long a stage of a crawl took for one item (exp: stats for a player)"""
+        with self._lock:
+            self._histogram(self._stages, stage).observe(seconds)
+
+    def track(self, policy):
+        """Exports the decision and wait counters of a retry.RetryPolicy along with the registry's own metrics"""
+        with self._lock:
+            if policy not in self._policies:
+                self._policies.append(policy)
+
+    def instrument(self, ses: requests.Session, session=None, proxy: str=None, endpoint=endpoint_of):
+        """Wraps every transport adapter of a session in an InstrumentedAdapter, so all of its calls are recorded,
+        those that fail without a response included
+        :param ses: session to be instrumented, after its adapters are mounted
+        :param session: id of the session
+        :param proxy: proxy country of the session
+        :param endpoint: callable taking the url and returning the endpoint name
+        """
+        wrapped = dict() #an adapter mounted for several prefixes gets a single wrapper
+        for prefix, adapter in list(ses.adapters.items()):
+            if id(adapter) not in wrapped:
+                wrapped[id(adapter)] = InstrumentedAdapter(adapter, registry=self, session=session, proxy=proxy,
+                                                           endpoint=endpoint)
+            ses.mount(prefix, wrapped[id(adapter)])
+
+    @staticmethod
+    def _labels(**labels) -> str:
+        escaped = ('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                   for name, value in labels.items())
+
+        return '{%s}' % ','.join(escaped)
+
+    def _export_histograms(self, lines: list, name: str, histograms: dict, label: str):
+        lines.append('# TYPE %s histogram' % name)
+        for key, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (name, self._labels(**{label: key, 'le': bound}), cumulative))
+            lines.append('%s_sum%s %f' % (name, self._labels(**{label: key}), histogram.sum))
+            lines.append('%s_count%s %d' % (name, self._labels(**{label: key}), histogram.count))
+
+    def prometheus(self) -> str:
+        """
+        :return: all metrics in the Prometheus text exposition format
+        """
+        p = self._prefix
+        lines = list()
+        with self._lock:
+            lines.append('# TYPE %s_requests_total counter' % p)
+            for (endpoint, status), count in sorted(self._requests.items()):
+                lines.append('%s_requests_total%s %d' % (p, self._labels(endpoint=endpoint, status=status), count))
+            lines.append('# TYPE %s_response_bytes_total counter' % p)
+            for endpoint, count in sorted(self._bytes.items()):
+                lines.append('%s_response_bytes_total%s %d' % (p, self._labels(endpoint=endpoint), count))
+            self._export_histograms(lines, '%s_request_seconds' % p, self._latency, label='endpoint')
+            lines.append('# TYPE %s_session_requests_total counter' % p)
+            for (session, status), count in sorted(self._sessions.items()):
+                lines.append('%s_session_requests_total%s %d' % (p, self._labels(session=session, status=status), count))
+            lines.append('# TYPE %s_proxy_requests_total counter' % p)
+            for (proxy, status), count in sorted(self._proxies.items()):
+                lines.append('%s_proxy_requests_total%s %d' % (p, self._labels(proxy=proxy, status=status), count))
+            lines.append('# TYPE %s_retries_total counter' % p)
+            for (endpoint, kind), count in sorted(self._retries.items()):
+                lines.append('%s_retries_total%s %d' % (p, self._labels(endpoint=endpoint, kind=kind), count))
+            self._export_histograms(lines, '%s_stage_seconds' % p, self._stages, label='stage')
+            policies = list(self._policies)
+        lines.append('# TYPE %s_retry_decisions_total counter' % p)
+        lines.append('# TYPE %s_retry_wait_seconds_total counter' % p)
+        for policy in policies:
+            for decision, count in sorted(policy.decisions.items()):
+                lines.append('%s_retry_decisions_total%s %d' % (p, self._labels(decision=decision), count))
+            for decision, seconds in sorted(policy.waited.items()):
+                lines.append('%s_retry_wait_seconds_total%s %f' % (p, self._labels(decision=decision), seconds))
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _timing(histogram: Histogram) -> dict:
+        return {'count': histogram.count,
+                'seconds': round(histogram.sum, 3),
+                'p50': histogram.quantile(0.5),
+                'p95': histogram.quantile(0.95),
+                'p99': histogram.quantile(0.99)}
+
+    def summary(self) -> dict:
+        """
+        :return: JSON serializable summary, endpoints and stages sorted by the seconds they took, most first
+        """
+        with self._lock:
+            endpoints = dict()
+            for (endpoint, status), count in self._requests.items():
+                entry = endpoints.setdefault(endpoint, {'requests': 0, 'statuses': dict(), 'bytes': self._bytes[endpoint]})
+                entry['requests'] += count
+                entry['statuses'][status] = count
+            for endpoint, histogram in self._latency.items():
+                endpoints[endpoint].update(self._timing(histogram))
+            for (endpoint, kind), count in self._retries.items():
+                endpoints.setdefault(endpoint, {'requests': 0, 'statuses': dict(), 'bytes': 0})
+                endpoints[endpoint].setdefault('retries', dict())[kind] = count
+            stages = {stage: self._timing(histogram) for stage, histogram in self._stages.items()}
+            sessions, proxies = collections.Counter(), dict()
+            for (session, status), count in self._sessions.items():
+                sessions[session] += count
+            for (proxy, status), count in self._proxies.items():
+                proxies.setdefault(proxy, dict())[status] = count
+            policies = list(self._policies)
+
+        by_seconds = lambda item: -item[1].get('seconds', 0)
+        return {'endpoints': dict(sorted(endpoints.items(), key=by_seconds)),
+                'stages': dict(sorted(stages.items(), key=by_seconds)),
+                'sessions': dict(sessions),
+                'proxies': proxies,
+                'retry_decisions': dict(sum((policy.decisions for policy in policies), collections.Counter())),
+                'retry_wait_seconds': {decision: round(seconds, 3) for decision, seconds in
+                                       sum((policy.waited for policy in policies), collections.Counter()).items()}}
+
+    def write(self, path: str):
+        """Writes the metrics to a file, as a JSON summary if path ends with .json and as Prometheus text otherwise
+        :param path: file to be written
+        """
+        with open(path, 'w') as out:
+            if path.endswith('.json'):
+                json.dump(self.summary(), out, indent=2)
+            else:
+                out.write(self.prometheus())
+
+
+class InstrumentedAdapter(BaseAdapter):
+
+    def __init__(self, adapter: BaseAdapter, registry: MetricsRegistry, session=None, proxy: str=None,
+                 endpoint=endpoint_of):
+        """Transport adapter recording every call of the adapter it wraps to a MetricsRegistry, see
+        MetricsRegistry.instrument
+        :param adapter: adapter that sends the requests
+        :param registry: where the calls are recorded
+        :param session: id of the session the adapter is mounted on
+        :param proxy: proxy country of the session
+        :param endpoint: callable taking the url and returning the endpoint name
+        """
+        super().__init__()
+
+        self._adapter = adapter
+        self._registry = registry
+        self._session = session
+        self._proxy = proxy
+        self._endpoint = endpoint
+
+    def send(self, request, stream=False, **kwargs):
+        start = time.monotonic()
+        try:
+            resp = self._adapter.send(request, stream=stream, **kwargs)
+        except Exception as err:
+            self._registry.observe(endpoint=self._endpoint(request.url), status=type(err).__name__,
+                                   session=self._session, proxy=self._proxy)
+            raise
+        #streamed bodies are left alone so they can still be cut short, others are read by the session right after
+        nbytes = int(resp.headers.get('Content-Length', 0)) if stream else len(resp.content)
+        self._registry.observe(endpoint=self._endpoint(request.url), status=resp.status_code, nbytes=nbytes,
+                               latency=time.monotonic() - start, session=self._session, proxy=self._proxy)
+
+        return resp
+
+    def close(self):
+        self._adapter.close()
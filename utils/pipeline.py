@@ -0,0 +1,73 @@
+import asyncio
+
+from utils import cons
+
+
+_STOP = object()
+
+
+class Pipeline(object):
+
+    def __init__(self, stages: list, maxsize: int=cons.QUEUE_SIZE):
+        """Chain of async stages connected by bounded queues; every item flows through all stages on its own
+        :param stages: list of (coroutine function, number of workers); each function takes an item and returns it,
+                       or returns None to drop the item
+        :param maxsize: items waiting between two stages, producers block while the next queue is full
+        """
+        super().__init__()
+
+        self._stages = stages
+        self._maxsize = maxsize
+
+    async def run(self, items: list, sink, batch_size: int=cons.DB_BATCH_SIZE) -> int:
+        """Feeds items through all stages and hands them to sink in batches as soon as they are done
+        :param items: items to be processed
+        :param sink: coroutine function called with a list of at most batch_size finished items
+        :param batch_size: number of finished items per sink call
+        :return: number of items that reached the sink
+        """
+        queues = [asyncio.Queue(maxsize=self._maxsize) for _ in range(len(self._stages) + 1)]
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+            await queues[0].put(_STOP)
+
+        async def work(func, inbox: asyncio.Queue, outbox: asyncio.Queue):
+            while True:
+                item = await inbox.get()
+                if item is _STOP:
+                    await inbox.put(_STOP) #let the stage's other workers stop too
+                    return
+                item = await func(item)
+                if item is not None:
+                    await outbox.put(item)
+
+        async def stage(index: int):
+            func, workers = self._stages[index]
+            await asyncio.gather(*(work(func, queues[index], queues[index + 1]) for _ in range(workers)))
+            await queues[index + 1].put(_STOP)
+
+        async def drain() -> int:
+            done, batch = 0, list()
+            while True:
+                item = await queues[-1].get()
+                if item is not _STOP:
+                    batch.append(item)
+                if batch and (len(batch) == batch_size or item is _STOP):
+                    await sink(batch)
+                    done += len(batch)
+                    batch = list()
+                if item is _STOP:
+                    return done
+
+        tasks = [asyncio.ensure_future(feed()), asyncio.ensure_future(drain())]
+        tasks.extend(asyncio.ensure_future(stage(index)) for index in range(len(self._stages)))
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return tasks[1].result()
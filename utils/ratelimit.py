@@ -0,0 +1,122 @@
+import threading
+import time
+
+from urllib import parse
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from utils import cons
+
+
+BLOCKED_STATUS_CODES = (403, 429)
+
+
+class AIMDRateLimiter(object):
+
+    def __init__(self, rate: float=cons.RATE_START,
+                 min_rate: float=cons.RATE_MIN,
+                 max_rate: float=cons.RATE_MAX,
+                 increase: float=cons.RATE_INCREASE,
+                 decrease: float=cons.RATE_DECREASE,
+                 burst: float=cons.RATE_BURST):
+        """Token bucket per host, whose rate grows additively on success and shrinks multiplicatively when blocked
+        A single limiter is meant to be shared by every session and worker that talks to the same hosts
+        :param rate: requests per second a host starts at
+        :param min_rate: lowest requests per second a host can be slowed down to
+        :param max_rate: highest requests per second a host can be sped up to
+        :param increase: requests per second added over one second of successful requests
+        :param decrease: factor the rate is multiplied with when a host blocks or times out
+        :param burst: most requests a host can get at once after being idle
+        """
+        super().__init__()
+
+        self._start_rate = rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._increase = increase
+        self._decrease = decrease
+        self._burst = burst
+        self._lock = threading.Lock()
+        self._buckets = dict()
+
+    def _bucket(self, host: str) -> dict:
+        if host not in self._buckets:
+            self._buckets[host] = {'rate': self._start_rate,
+                                   'tokens': self._burst,
+                                   'updated': time.monotonic(),
+                                   'decreased': 0.0}
+
+        return self._buckets[host]
+
+    def rate(self, host: str) -> float:
+        """
+        :return: current requests per second allowed for host
+        """
+        with self._lock:
+            return self._bucket(host)['rate']
+
+    def acquire(self, host: str):
+        """Blocks until a request to host is allowed
+        :param host: host the request goes to
+        """
+        while True:
+            with self._lock:
+                bucket = self._bucket(host)
+                now = time.monotonic()
+                bucket['tokens'] = min(self._burst, bucket['tokens'] + (now - bucket['updated']) * bucket['rate'])
+                bucket['updated'] = now
+                if bucket['tokens'] >= 1:
+                    bucket['tokens'] -= 1
+                    return
+                wait = (1 - bucket['tokens']) / bucket['rate']
+            time.sleep(wait)
+
+    def success(self, host: str):
+        """Additive increase, spread over the requests made in a second
+        :param host: host that answered
+        """
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket['rate'] = min(self._max_rate, bucket['rate'] + self._increase / bucket['rate'])
+
+    def backoff(self, host: str):
+        """Multiplicative decrease, at most once per second so a burst of failures in flight counts only once
+        :param host: host that blocked or timed out
+        """
+        with self._lock:
+            bucket = self._bucket(host)
+            now = time.monotonic()
+            if now - bucket['decreased'] < 1:
+                return
+            bucket['rate'] = max(self._min_rate, bucket['rate'] * self._decrease)
+            bucket['tokens'] = min(bucket['tokens'], 0)
+            bucket['decreased'] = now
+
+
+class RateLimitedAdapter(HTTPAdapter):
+
+    def __init__(self, limiter: AIMDRateLimiter, **kwargs):
+        """Transport adapter that makes every request of a session go through a rate limiter
+        Works for anything built on the session, requests_futures.FuturesSession and the crawl engine included
+        :param limiter: limiter shared by all sessions
+        """
+        super().__init__(**kwargs)
+
+        self._limiter = limiter
+
+    def send(self, request, **kwargs):
+        host = parse.urlsplit(request.url).netloc
+        self._limiter.acquire(host)
+        try:
+            resp = super().send(request, **kwargs)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            self._limiter.backoff(host)
+            raise
+        if resp.status_code in BLOCKED_STATUS_CODES:
+            self._limiter.backoff(host)
+        else:
+            self._limiter.success(host)
+
+        return resp
@@ -0,0 +1,180 @@
+import asyncio
+import collections
+import random
+import threading
+import time
+
+import requests
+
+from utils import cons
+
+
+NETWORK = 'network'
+PARSE = 'parse'
+BLOCKED = 'blocked'
+
+
+class BlockedError(Exception):
+    """The site refused to serve a request (exp: 403 or 429)"""
+
+    def __init__(self, url: str, status_code: int):
+        super().__init__('%s blocked with status %d' % (url, status_code))
+
+        self.url = url
+        self.status_code = status_code
+
+
+class ServerError(Exception):
+    """The site failed to serve a request (exp: 500 or 503), retried as a network error"""
+
+    def __init__(self, url: str, status_code: int):
+        super().__init__('%s failed with status %d' % (url, status_code))
+
+        self.url = url
+        self.status_code = status_code
+
+
+def classify(err: Exception) -> str:
+    """
+    :param err: error raised by a request or by decoding its response
+    :return: BLOCKED, NETWORK, PARSE or None if the error is not worth retrying
+    """
+    if isinstance(err, BlockedError):
+        return BLOCKED
+    if isinstance(err, (ServerError, requests.exceptions.RequestException, ConnectionError, TimeoutError)):
+        return NETWORK
+    if isinstance(err, (ValueError, KeyError, IndexError)): #json.JSONDecodeError is a ValueError
+        return PARSE
+
+    return None
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, window: int=cons.BREAKER_WINDOW,
+                 failure_rate: float=cons.BREAKER_FAILURE_RATE,
+                 cooldown: float=cons.BREAKER_COOLDOWN):
+        """Stops traffic through a proxy exit for a while when too many of its latest requests failed
+        :param window: number of latest outcomes the failure rate is computed on
+        :param failure_rate: failure rate that opens the breaker, once the window is full
+        :param cooldown: seconds the breaker stays open before traffic is let through again
+        """
+        super().__init__()
+
+        self._failure_rate = failure_rate
+        self._cooldown = cooldown
+        self._lock = threading.Lock()
+        self._outcomes = collections.deque(maxlen=window)
+        self._open_until = 0.0
+
+    def remaining(self) -> float:
+        """
+        :return: seconds until the breaker lets traffic through, 0 if it is closed
+        """
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic())
+
+    def record(self, ok: bool) -> bool:
+        """Records the outcome of a request
+        :param ok: False if the request failed because of the network or the site blocking it
+        :return: True if this outcome opened the breaker
+        """
+        with self._lock:
+            self._outcomes.append(ok)
+            if len(self._outcomes) < self._outcomes.maxlen:
+                return False
+            if self._outcomes.count(False) / len(self._outcomes) < self._failure_rate:
+                return False
+            self._open_until = time.monotonic() + self._cooldown
+            self._outcomes.clear() #start over once it closes again
+
+        return True
+
+
+class RetryPolicy(object):
+
+    def __init__(self, attempts: int=cons.RETRY_ATTEMPTS,
+                 backoff: float=cons.RETRY_BACKOFF,
+                 max_backoff: float=cons.RETRY_MAX_BACKOFF):
+        """Retries failed calls a bounded number of times with exponential backoff and full jitter
+        Failures are classified as network, parse or blocked; network and blocked failures feed a circuit breaker
+        per key (exp: proxy country). Every decision is counted in self.decisions, every second spent waiting in
+        self.waited
+        :param attempts: maximum number of calls, the first one included
+        :param backoff: seconds to wait, at most, before the first retry; doubled for every further retry
+        :param max_backoff: seconds to wait, at most, before any retry
+        """
+        super().__init__()
+
+        self._attempts = attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._breakers = dict()
+        self.decisions = collections.Counter()
+        self.waited = collections.Counter()
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        """
+        :param key: name of the traffic the breaker guards (exp: proxy country)
+        :return: the circuit breaker of key
+        """
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker()
+            return self._breakers[key]
+
+    def _count(self, decision: str, waited: float=0.0):
+        with self._lock:
+            self.decisions[decision] += 1
+            if waited:
+                self.waited[decision] += waited
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self._max_backoff, self._backoff * 2 ** attempt))
+
+    def _decide(self, err: Exception, attempt: int, key: str, on_error) -> float:
+        """Decides what happens after a failed call, raising err when it should not be retried
+        :return: seconds to wait before the next attempt
+        """
+        kind = classify(err)
+        if kind is None:
+            self._count('fatal')
+            raise err
+        if kind != PARSE and self.breaker(key).record(ok=False):
+            self._count('breaker_open:%s' % key)
+        if attempt + 1 >= self._attempts:
+            self._count('give_up:%s' % kind)
+            raise err
+        if on_error:
+            on_error(err, kind)
+        delay = self._delay(attempt)
+        self._count('retry:%s' % kind, waited=delay)
+
+        return delay
+
+    def _succeeded(self, key: str):
+        self.breaker(key).record(ok=True)
+        self._count('success')
+
+    async def acall(self, func, kwargs: dict=None, key: str=None, on_error=None):
+        """Awaits func until it succeeds or the policy gives up, waiting without blocking the event loop
+        :param func: coroutine function to be retried
+        :param kwargs: keyword arguments of func
+        :param key: name of the circuit breaker to use
+        :param on_error: callable taking (err, kind) run before every retry (exp: renew a session); may raise
+        :return: what func returned
+        """
+        kwargs = kwargs if kwargs else dict()
+        for attempt in range(self._attempts):
+            paused = self.breaker(key).remaining()
+            if paused:
+                self._count('breaker_wait', waited=paused)
+                await asyncio.sleep(paused)
+            try:
+                result = await func(**kwargs)
+            except Exception as err:
+                await asyncio.sleep(self._decide(err, attempt=attempt, key=key, on_error=on_error))
+                continue
+            self._succeeded(key)
+            return result
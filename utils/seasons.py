@@ -0,0 +1,83 @@
+import json
+import sqlite3
+import threading
+
+
+class SeasonStore(object):
+
+    def __init__(self, path: str):
+        """Local store of per season stats rows
+        Seasons that are no longer played are closed: their rows can no longer change, so they are fetched once
+        Which seasons are still open is read from the site's responses, never from a hard-coded season
+        :param path: sqlite file the rows are kept in, created if missing
+        """
+        super().__init__()
+
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS season_rows ('
+                           'player_id TEXT, '
+                           'category TEXT, '
+                           'subcategory TEXT, '
+                           'accumulation TEXT, '
+                           'position INTEGER, '
+                           'season TEXT, '
+                           'data TEXT)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS season_rows_key '
+                           'ON season_rows (player_id, category, subcategory, accumulation)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS open_seasons ('
+                           'player_id TEXT, '
+                           'category TEXT, '
+                           'subcategory TEXT, '
+                           'accumulation TEXT, '
+                           'seasons TEXT, '
+                           'PRIMARY KEY (player_id, category, subcategory, accumulation))')
+        self._conn.commit()
+
+    def get_closed(self, player_id: str, category: str, subcategory: str, accumulation: str) -> tuple:
+        """
+        :param player_id: whoscored id of the player
+        :param category: stats category (exp: passes)
+        :param subcategory: stats subcategory (exp: length)
+        :param accumulation: statsAccumulationType of the request
+        :return: (seasons that were open when the history was stored, rows of all other seasons newest first),
+                 or None if no history was stored
+        """
+        key = (player_id, category, subcategory, accumulation)
+        with self._lock:
+            history = self._conn.execute('SELECT seasons FROM open_seasons WHERE player_id = ? AND category = ? '
+                                         'AND subcategory = ? AND accumulation = ?', key).fetchone()
+            if not history:
+                return None
+            rows = self._conn.execute('SELECT data FROM season_rows WHERE player_id = ? AND category = ? '
+                                      'AND subcategory = ? AND accumulation = ? ORDER BY position', key).fetchall()
+
+        return set(json.loads(history[0])), [json.loads(row[0]) for row in rows]
+
+    def put_closed(self, player_id: str, category: str, subcategory: str, accumulation: str, rows: list,
+                   open_seasons: set):
+        """Stores the closed seasons' rows of a full history, replacing whatever was stored before
+        :param player_id: whoscored id of the player
+        :param category: stats category (exp: passes)
+        :param subcategory: stats subcategory (exp: length)
+        :param accumulation: statsAccumulationType of the request
+        :param rows: playerTableStats of the full history, newest first
+        :param open_seasons: seasons still being played, their rows are skipped; stored rows are only served while
+                             the seasons open are these very ones
+        """
+        key = (player_id, category, subcategory, accumulation)
+        closed = [row for row in rows if row['seasonName'] not in open_seasons]
+        with self._lock:
+            self._conn.execute('DELETE FROM season_rows WHERE player_id = ? AND category = ? '
+                               'AND subcategory = ? AND accumulation = ?', key)
+            self._conn.executemany('INSERT INTO season_rows VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                   [key + (position, row['seasonName'], json.dumps(row))
+                                    for position, row in enumerate(closed)])
+            self._conn.execute('INSERT OR REPLACE INTO open_seasons VALUES (?, ?, ?, ?, ?)',
+                               key + (json.dumps(sorted(open_seasons)),))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,31 +1,68 @@
+import collections
+import itertools
 import socket
+import threading
+import time
 import uuid
 import requests
 
+from requests.adapters import HTTPAdapter
+
+from utils import cons
+from utils import ratelimit
+
+
+_dns_cache = dict()
+_dns_lock = threading.Lock()
+
+
+def resolve(host: str, ttl: float=cons.DNS_TTL) -> str:
+    """socket.gethostbyname, cached for ttl seconds
+    :param host: host name to be resolved
+    :param ttl: seconds a resolution is reused
+    :return: ip address
+    """
+    with _dns_lock:
+        cached = _dns_cache.get(host)
+    if cached and time.monotonic() - cached[1] < ttl:
+        return cached[0]
+    ip = socket.gethostbyname(host)
+    with _dns_lock:
+        _dns_cache[host] = (ip, time.monotonic())
+
+    return ip
+
 
 class SessionFactory(object):
 
-    def build(self, headers: dict, proxy: bool=False, country_code: str=None) -> requests.Session:
+    def build(self, headers: dict, proxy: bool=False, country_code: str=None, pool_maxsize: int=None,
+              limiter: ratelimit.AIMDRateLimiter=None) -> requests.Session:
         """Configures and returns a session object.
         :param headers: desired headers for the new session object
         :param proxy: set this to True if you want to use a proxy
                       if is True, country parameter also has to be passed
         :param country_code: two-letter iso code of desired proxy's origin, exp >> pl
+        :param pool_maxsize: number of connections kept alive per host, set it to the number of concurrent requests
+        :param limiter: if provided, every request of the session waits for it, share it between sessions
         """
         if proxy:
             proxy_url = self._get_proxy_url(country_code)
-            session = self._build(headers=headers, http_proxy=proxy_url, https_proxy=proxy_url)
+            session = self._build(headers=headers, http_proxy=proxy_url, https_proxy=proxy_url, pool_maxsize=pool_maxsize,
+                                  limiter=limiter)
         else:
-            session =self._build(headers=headers)
+            session =self._build(headers=headers, pool_maxsize=pool_maxsize, limiter=limiter)
 
         return session
 
     @staticmethod
-    def _build(headers: dict, http_proxy: str=None, https_proxy: str=None) -> requests.Session:
+    def _build(headers: dict, http_proxy: str=None, https_proxy: str=None, pool_maxsize: int=None,
+               limiter: ratelimit.AIMDRateLimiter=None) -> requests.Session:
         """Configures and returns a session object.
         :param http_proxy: the proxy to be used for http connections
         :param https_proxy: the proxy to be used for https connections
         :param headers: a dict of headers to be added to the every request
+        :param pool_maxsize: number of connections kept alive per host
+        :param limiter: rate limiter every request waits for
         :returns: a session object
         """
         proxies = {
@@ -36,6 +73,16 @@ class SessionFactory(object):
         session.headers.update(headers)
         if http_proxy and https_proxy:
             session.proxies.update(proxies)
+        pool = dict(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize) if pool_maxsize else dict()
+        if limiter:
+            adapter = ratelimit.RateLimitedAdapter(limiter, **pool)
+        elif pool:
+            adapter = HTTPAdapter(**pool)
+        else:
+            adapter = None
+        if adapter:
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
         return session
 
     @staticmethod
@@ -46,8 +93,191 @@ class SessionFactory(object):
         :param country_code: the country code
         :returns: url needed to connect to proxy
         """
-        proxy_ip = socket.gethostbyname('servercountry-gb.zproxy.luminati.io')
+        proxy_ip = resolve('servercountry-gb.zproxy.luminati.io')
         rand = str(uuid.uuid4()).replace('-', '')
         return 'http://your_proxy-' \
                'country-{0}-dns-remote-session-{1}:339d479bc57f@{2}:22225'.format(
             country_code, rand, proxy_ip)
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    :param values: samples
+    :param q: percentile wanted, between 0 and 100
+    :return: nearest-rank percentile of values, None if there are none
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class PooledSession(object):
+
+    _ids = itertools.count(1)
+
+    def __init__(self, session: requests.Session, country_code: str=None):
+        """A session of a SessionPool and what it has done so far
+        :param session: the session itself
+        :param country_code: country of the session's proxy
+        """
+        super().__init__()
+
+        self.id = next(self._ids)
+        self.session = session
+        self.country_code = country_code
+        self.requests = 0
+        self.errors = 0
+        self.leases = 0
+        self.retired = False
+        self.latencies = collections.deque(maxlen=cons.LATENCY_WINDOW)
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        :param q: percentile wanted, between 0 and 100
+        :return: seconds, over the session's latest requests, or None if it made none yet
+        """
+        return percentile(list(self.latencies), q)
+
+
+class SessionPool(object):
+
+    def __init__(self, build, size: int=cons.SESSION_POOL_SIZE,
+                 max_requests: int=cons.SESSION_MAX_REQUESTS,
+                 max_error_rate: float=cons.SESSION_MAX_ERROR_RATE,
+                 warm_url: str=None):
+        """Pre-built sessions per proxy country, leased to workers and retired when worn out instead of rebuilt on
+        every failure
+        :param build: callable taking country_code and returning a new configured session
+        :param size: sessions kept per country
+        :param max_requests: requests a session serves before it is retired
+        :param max_error_rate: failure rate, over at least cons.SESSION_MIN_REQUESTS requests, that retires a session
+        :param warm_url: if provided, new sessions request it once so their connections are open before the first lease
+        """
+        super().__init__()
+
+        self._build = build
+        self._size = size
+        self._max_requests = max_requests
+        self._max_error_rate = max_error_rate
+        self._warm_url = warm_url
+        self._lock = threading.Lock()
+        self._pools = dict()
+
+    def _new(self, country_code: str) -> PooledSession:
+        """Builds and warms a session, without holding the pool's lock
+        :return: new pooled session
+        """
+        pooled = PooledSession(session=self._build(country_code=country_code), country_code=country_code)
+        if self._warm_url:
+            try:
+                pooled.session.head(self._warm_url, timeout=cons.SESSION_WARM_TIMEOUT)
+            except requests.exceptions.RequestException:
+                pass #a cold session still works, it just opens its connections on first use
+
+        return pooled
+
+    def warm(self, country_code: str=None):
+        """Fills the pool of a country up to its size
+        :param country_code: country of the sessions' proxy
+        """
+        with self._lock:
+            missing = self._size - len(self._pools.setdefault(country_code, list()))
+        fresh = [self._new(country_code=country_code) for _ in range(missing)]
+        with self._lock:
+            self._pools[country_code].extend(fresh)
+
+    def _score(self, pooled: PooledSession) -> tuple:
+        """Sort key of lease, healthy sessions first, then the ones with the lowest p95 latency per lease in flight
+        Sessions without latencies yet come first among the healthy ones, so every proxy exit gets measured
+        """
+        unhealthy = pooled.requests >= cons.SESSION_MIN_REQUESTS and pooled.error_rate >= self._max_error_rate / 2
+        p95 = pooled.percentile(95)
+
+        return unhealthy, (p95 or 0.0) * (pooled.leases + 1), pooled.leases
+
+    def lease(self, country_code: str=None, exclude: PooledSession=None) -> PooledSession:
+        """Leases the fastest healthy session of a country, the pool is warmed first if it is empty
+        Every lease must be given back with self.release
+        :param country_code: country of the session's proxy
+        :param exclude: session not to be leased unless it is the only one (exp: the one a request is hedged against)
+        :return: pooled session, its requests.Session is pooled.session
+        """
+        while True:
+            with self._lock:
+                pool = [pooled for pooled in self._pools.get(country_code, list()) if pooled is not exclude]
+                pool = pool if pool else self._pools.get(country_code)
+                if pool:
+                    pooled = min(pool, key=self._score)
+                    pooled.leases += 1
+                    return pooled
+            self.warm(country_code=country_code)
+
+    def _latencies(self, country_code: str) -> list:
+        with self._lock:
+            return [latency for pooled in self._pools.get(country_code, list()) for latency in pooled.latencies]
+
+    def timeout(self, country_code: str=None) -> float:
+        """Timeout derived from the p95 latency of a country's sessions
+        :param country_code: country of the sessions' proxy
+        :return: seconds, cons.DEFAULT_TIMEOUT until there are enough latencies
+        """
+        latencies = self._latencies(country_code=country_code)
+        if len(latencies) < cons.LATENCY_MIN_SAMPLES:
+            return cons.DEFAULT_TIMEOUT
+
+        return min(cons.TIMEOUT_MAX, max(cons.TIMEOUT_MIN, cons.TIMEOUT_FACTOR * percentile(latencies, 95)))
+
+    def hedge_delay(self, country_code: str=None) -> float:
+        """Seconds a request waits before a duplicate is sent on a second session: the p95 latency of a country
+        :param country_code: country of the sessions' proxy
+        :return: seconds, None until there are enough latencies
+        """
+        latencies = self._latencies(country_code=country_code)
+        if len(latencies) < cons.LATENCY_MIN_SAMPLES:
+            return None
+
+        return percentile(latencies, 95)
+
+    def release(self, pooled: PooledSession, ok: bool=True, latency: float=None, scrub=None):
+        """Gives a leased session back, retiring it if it served too many requests or failed too often
+        :param pooled: as returned by self.lease
+        :param ok: False if the request made with the session failed
+        :param latency: seconds the request took, if it completed
+        :param scrub: if provided, a callable taking the requests.Session, run under the pool's lock once no other
+                      lease holds the session (exp: to clear its cookies), so no request sees it half done
+        """
+        with self._lock:
+            pooled.leases -= 1
+            if scrub and not pooled.leases:
+                scrub(pooled.session)
+            pooled.requests += 1
+            pooled.errors += 0 if ok else 1
+            if latency is not None:
+                pooled.latencies.append(latency)
+            worn = pooled.requests >= self._max_requests or \
+                (pooled.requests >= cons.SESSION_MIN_REQUESTS and pooled.error_rate >= self._max_error_rate)
+            retire = worn and not pooled.retired
+            if retire:
+                pooled.retired = True
+                self._pools[pooled.country_code].remove(pooled)
+            close = pooled.retired and not pooled.leases
+        if retire:
+            fresh = self._new(country_code=pooled.country_code)
+            with self._lock:
+                self._pools[pooled.country_code].append(fresh)
+        if close:
+            pooled.session.close()
+
+    def close(self):
+        """Closes every session of the pool, leased ones included"""
+        with self._lock:
+            pools, self._pools = self._pools, dict()
+        for pool in pools.values():
+            for pooled in pool:
+                pooled.session.close()
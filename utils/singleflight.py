@@ -0,0 +1,74 @@
+import asyncio
+import collections
+import concurrent.futures as cf
+import threading
+
+from utils import cons
+
+
+class SingleFlight(object):
+
+    def __init__(self, size: int=cons.MEMO_SIZE):
+        """Makes identical calls share one execution: a call made while the same one is in flight waits for its
+        result, a call made after it completed is served from a memo of the latest results
+        The memo is kept until self.clear, call it when the results may have gone stale (exp: at the end of a run)
+        Calls that raise are not memoized, so a call made again after a failure runs again
+        :param size: number of results kept in the memo, the least recently used ones are dropped first
+        """
+        super().__init__()
+
+        self._size = size
+        self._lock = threading.Lock()
+        self._flights = dict()
+        self._memo = collections.OrderedDict()
+
+    def _join(self, key) -> tuple:
+        """
+        :return: (memoized result or None, future to wait for or None, future to complete or None)
+        """
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key], None, None
+            if key in self._flights:
+                return None, self._flights[key], None
+            future = self._flights[key] = cf.Future()
+
+            return None, None, future
+
+    def _land(self, key, future: cf.Future, result=None, err: Exception=None):
+        with self._lock:
+            del self._flights[key]
+            if err is None:
+                self._memo[key] = result
+                if len(self._memo) > self._size:
+                    self._memo.popitem(last=False)
+        if err is None:
+            future.set_result(result)
+        else:
+            future.set_exception(err)
+
+    async def acall(self, key, func, **kwargs):
+        """Awaits func(**kwargs), unless a call with the same key is in flight or memoized
+        :param key: hashable, equal for calls that would return the same result
+        :param func: coroutine function
+        :return: what func returned, to this call or to the one it joined
+        """
+        result, waiting, future = self._join(key)
+        if waiting:
+            return await asyncio.wrap_future(waiting)
+        if future is None:
+            return result
+        try:
+            result = await func(**kwargs)
+        except BaseException as err:
+            self._land(key, future, err=err)
+            raise
+        self._land(key, future, result=result)
+
+        return result
+
+    def clear(self):
+        """Drops the memo, calls in flight are not affected"""
+        with self._lock:
+            self._memo.clear()
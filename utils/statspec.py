@@ -0,0 +1,114 @@
+from utils import cons
+
+
+_fields = dict()
+
+
+def fields(category: str, subcategory: str) -> tuple:
+    """
+    :param category: stats category (exp: passes)
+    :param subcategory: stats subcategory (exp: length)
+    :return: fields of a row that cons.STATS_SPEC adds up for the category, in order of first use
+    """
+    key = (category, subcategory)
+    if key == ('summary', 'all'):
+        return cons.SUMMARY_FIELDS
+    if key not in _fields:
+        spec = cons.STATS_SPEC[key]
+        found = [field for summed in spec.get('sums', dict()).values() for field in summed]
+        for numerator, denominator in spec.get('ratios', dict()).values():
+            found.extend(numerator + denominator)
+        _fields[key] = tuple(dict.fromkeys(found))
+
+    return _fields[key]
+
+
+def categories(groups: tuple) -> list:
+    """Requests needed for some stats groups, each of them only once even if several groups share it
+    :param groups: names of cons.STATS_GROUPS (exp: cons.ROLE_STATS['Defender'])
+    :return: (category, subcategory) in the order their stats are merged
+    """
+    return list(dict.fromkeys(key for group in groups for key in cons.STATS_GROUPS[group]))
+
+
+def relevant(rows: list) -> int:
+    """The rule for which rows of a player count, shared by every path that sums them: the rows before the first
+    one of cons.FIRST_IRRELEVANT_SEASON; a history without that season counts whole, whatever its season names
+    :param rows: stats rows of a player, newest season first
+    :return: number of leading rows that count
+    """
+    for index, item in enumerate(rows):
+        if item['seasonName'] == cons.FIRST_IRRELEVANT_SEASON:
+            return index
+
+    return len(rows)
+
+
+def totals(rows: list, summed: tuple) -> dict:
+    """Adds up fields over the relevant rows
+    :param rows: stats rows, newest season first
+    :param summed: fields to be added up
+    :return: dict[field] = sum
+    """
+    sums = dict.fromkeys(summed, 0)
+    for item in rows[:relevant(rows)]:
+        for field in summed:
+            sums[field] += item[field]
+
+    return sums
+
+
+def xp_weight(tournament: str) -> float:
+    """
+    :return: factor of the minutes played in a tournament: 1.2 for international ones, 1.0 for cons.A_RATED_LEAGUES
+             and 0.8 for any other
+    """
+    if tournament in cons.INTERNATIONAL_LEAGUES:
+        return 1.2
+    if tournament in cons.A_RATED_LEAGUES:
+        return 1.0
+
+    return 0.8
+
+
+def experience(rows: list) -> dict:
+    """
+    :param rows: summary rows of a player, newest season first
+    :return: dict with xp, weighted minutes played, and apps over the relevant rows
+    """
+    xp, apps = 0, 0
+    for item in rows[:relevant(rows)]:
+        xp += xp_weight(item['tournamentName']) * item['minsPlayed']
+        apps += item['apps']
+
+    return {'xp': int(xp), 'apps': int(apps)}
+
+
+def derive(spec: dict, sums: dict) -> dict:
+    """
+    :param spec: a value of cons.STATS_SPEC
+    :param sums: as returned by totals()
+    :return: stats of the category, counts as int and ratios as a percentage with two decimals
+    """
+    stats = dict()
+    for stat, summed in spec.get('sums', dict()).items():
+        stats[stat] = int(sum(sums[field] for field in summed))
+    for stat, (numerator, denominator) in spec.get('ratios', dict()).items():
+        part = sum(sums[field] for field in numerator)
+        whole = sum(sums[field] for field in denominator)
+        stats[stat] = round(part / whole * 100, 2) if part and whole else 0.0
+
+    return stats
+
+
+def aggregate(tables: list) -> dict:
+    """Stats of a player from the rows of every category requested for them
+    :param tables: (category, subcategory), rows pairs; a stat derived by several categories keeps the last value
+    :return: dict[stat] = value
+    """
+    stats = dict()
+    for (category, subcategory), rows in tables:
+        stats.update(derive(cons.STATS_SPEC[(category, subcategory)],
+                            totals(rows, fields(category, subcategory))))
+
+    return stats
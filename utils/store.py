@@ -0,0 +1,109 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+
+from urllib import parse
+
+
+class MissingResponse(KeyError):
+    """Raised in replay mode when a request was never stored"""
+
+
+class StoredResponse(object):
+
+    def __init__(self, url: str, status_code: int, content: bytes, fetched_at: float):
+        """Response read back from a ResponseStore, exposes the parts of requests.Response the crawlers use
+        :param url: url of the stored request, including the query string
+        :param status_code: http status of the stored response
+        :param content: uncompressed body
+        :param fetched_at: unix timestamp of the original download
+        """
+        super().__init__()
+
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.fetched_at = fetched_at
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8')
+
+
+class ResponseStore(object):
+
+    def __init__(self, path: str):
+        """On disk store of raw responses, keyed by url and normalized params
+        :param path: sqlite file the responses are kept in, created if missing
+        """
+        super().__init__()
+
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                           'key TEXT PRIMARY KEY, '
+                           'url TEXT, '
+                           'status INTEGER, '
+                           'fetched_at REAL, '
+                           'body BLOB)')
+        self._conn.commit()
+
+    @staticmethod
+    def url(url: str, params: dict=None) -> str:
+        """Normalizes a request to a single url, with query parameters sorted by name
+        :param url: requested url
+        :param params: query parameters, if any
+        :return: normalized url
+        """
+        parts = parse.urlsplit(url)
+        query = parse.parse_qsl(parts.query, keep_blank_values=True)
+        if params:
+            query.extend((key, str(value)) for key, value in params.items())
+        query = parse.urlencode(sorted(query))
+
+        return parse.urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+    @classmethod
+    def key(cls, url: str, params: dict=None) -> str:
+        """
+        :return: the content address of a request
+        """
+        return hashlib.sha256(cls.url(url, params).encode('utf-8')).hexdigest()
+
+    def get(self, url: str, params: dict=None) -> StoredResponse:
+        """
+        :param url: requested url
+        :param params: query parameters, if any
+        :return: the stored response or None if the request was never stored
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT url, status, fetched_at, body FROM responses WHERE key = ?',
+                                     (self.key(url, params),)).fetchone()
+        if not row:
+            return None
+
+        return StoredResponse(url=row[0], status_code=row[1], content=zlib.decompress(row[3]), fetched_at=row[2])
+
+    def put(self, url: str, params: dict, status_code: int, content: bytes, fetched_at: float=None):
+        """Stores a response compressed, replacing any older copy of the same request
+        :param url: requested url
+        :param params: query parameters, if any
+        :param status_code: http status of the response
+        :param content: raw body
+        :param fetched_at: unix timestamp of the download, defaults to now
+        """
+        row = (self.key(url, params),
+               self.url(url, params),
+               status_code,
+               fetched_at if fetched_at else time.time(),
+               zlib.compress(content))
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)', row)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from utils import cons
+
+
+class TokenManager(object):
+
+    def __init__(self, ttl: float=cons.TOKEN_TTL):
+        """Keeps a header token (exp: whoscored's Model-last-Mode) shared by all requests and sessions
+        :param ttl: seconds a token is reused before it is loaded again
+        """
+        super().__init__()
+
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._token = None
+        self._loaded_at = 0.0
+
+    @property
+    def token(self) -> str:
+        """
+        :return: the current token or None if there is none or it expired
+        """
+        if self._token and time.monotonic() - self._loaded_at < self._ttl:
+            return self._token
+
+        return None
+
+    def get(self, loader) -> str:
+        """Returns the current token, loading a new one if needed
+        Only one caller loads at a time, the others wait and reuse its token
+        :param loader: callable that downloads and returns a fresh token
+        :return: token
+        """
+        token = self.token
+        if token:
+            return token
+
+        with self._lock:
+            token = self.token
+            if not token:
+                token = loader()
+                self._token = token
+                self._loaded_at = time.monotonic()
+
+        return token
+
+    def invalidate(self, token: str):
+        """Drops a token that was rejected, unless it was already replaced by a newer one
+        :param token: the rejected token
+        """
+        with self._lock:
+            if self._token == token:
+                self._token = None